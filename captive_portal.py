@@ -0,0 +1,56 @@
+from microdot import Response
+
+# --- Captive Portal Probe Fast Path ---
+# In AP mode every phone on the setup network polls its OS connectivity
+# check URL, often several times a second. All of them get the same
+# redirect to the setup page, written from one precomputed byte string:
+# no auth check, no Response headers to build, nothing allocated.
+
+# Connectivity check paths used by Android, iOS/macOS, Windows, Firefox,
+# Chrome OS, Kindle and common Linux desktops
+PROBE_PATHS = (
+    "/generate_204", "/gen_204",
+    "/hotspot-detect.html", "/library/test/success.html",
+    "/ncsi.txt", "/connecttest.txt", "/redirect",
+    "/canonical.html", "/success.txt",
+    "/kindle-wifi/wifistub.html", "/check_network_status.txt",
+)
+
+class RawResponse(Response):
+    """A response sent as fixed bytes, shared by every request."""
+    def __init__(self, data, status_code):
+        super().__init__(status_code=status_code)
+        self.data = data
+
+    async def write(self, stream):
+        await stream.awrite(self.data)
+
+redirect = None
+counts = {path: 0 for path in PROBE_PATHS}
+total = 0
+
+def init(ip):
+    """Precompute the redirect to http://ip/. Call once the AP is up."""
+    global redirect
+    redirect = RawResponse((
+        "HTTP/1.0 302 Found\r\n"
+        f"Location: http://{ip}/\r\n"
+        "Content-Length: 0\r\n"
+        "Cache-Control: no-store\r\n"
+        "\r\n"
+    ).encode(), 302)
+
+def respond(path):
+    """The shared redirect if path is a connectivity probe, else None."""
+    global total
+    if redirect is None or path not in counts:
+        return None
+    counts[path] += 1
+    total += 1
+    return redirect
+
+def get_stats():
+    return {
+        "total": total,
+        "probes": {path: n for path, n in counts.items() if n},
+    }
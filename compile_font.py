@@ -1,6 +1,10 @@
 import os
 import glob
 import re
+import json
+import struct
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageFont, ImageDraw
 
 # Configuration
@@ -11,6 +15,8 @@ if not os.path.exists(FONT_PATH):
 
 OUTPUT_FILE = "font_zh.py"
 FONT_SIZE = 16  # 16x16 pixels
+FONT_MAGIC = b"FZH1"
+GLYPH_BYTES = FONT_SIZE * FONT_SIZE // 8
 
 # Common 500+ Chinese Characters (Simplified)
 COMMON_CHARS = """
@@ -37,7 +43,7 @@ def get_chinese_chars(directory="."):
     return sorted(list(chinese_chars))
 
 def render_char_bitmap(font, char):
-    """Renders a character to a bit bytearray (0=Black/Text, 1=White/Background)."""
+    """Renders a character to MONO_HLSB bytes (0=Black/Text, 1=White/Background)."""
     # Create a blank image (White background = 1)
     image = Image.new("1", (FONT_SIZE, FONT_SIZE), 1)
     draw = ImageDraw.Draw(image)
@@ -59,24 +65,70 @@ def render_char_bitmap(font, char):
     # Draw text (Black = 0)
     draw.text((0, y_offset), char, font=font, fill=0)
     
-    # Extract bytes for MONO_HLSB
-    pixels = image.load()
-    buffer = bytearray()
-    
-    for y in range(FONT_SIZE):
-        byte_val = 0
-        for x in range(0, 8):
-            if pixels[x, y]: # If pixel is 1 (White)
-                byte_val |= (1 << (7 - x))
-        buffer.append(byte_val)
-        
-        byte_val = 0
-        for x in range(8, 16):
-            if pixels[x, y]:
-                byte_val |= (1 << (15 - x))
-        buffer.append(byte_val)
-        
-    return buffer
+    # Mode "1" rows are packed MSB-first with 1=White, which is exactly
+    # MONO_HLSB for a 16px wide glyph (2 bytes per row)
+    return image.tobytes()
+
+# --- Parallel, Incremental Rendering ---
+# Rendered bitmaps are cached per (font contents, size, render version), so
+# a rebuild only renders characters that were not seen before. The cache
+# lives outside build/ because flash.py and deploy_ota.py wipe it.
+CACHE_DIR = os.environ.get(
+    "FONT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "esp32-web-led")
+)
+RENDER_VERSION = 1  # Bump when render_char_bitmap output changes
+PARALLEL_MIN = 64   # Below this, a process pool costs more than it saves
+
+_worker_font = None
+
+def _init_worker(font_path, font_size):
+    global _worker_font
+    _worker_font = ImageFont.truetype(font_path, font_size)
+
+def _render_worker(char):
+    return char, render_char_bitmap(_worker_font, char)
+
+def cache_path():
+    digest = hashlib.sha256()
+    with open(FONT_PATH, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(f"{os.path.abspath(FONT_PATH)}:{FONT_SIZE}:{RENDER_VERSION}".encode())
+    return os.path.join(CACHE_DIR, f"glyphs-{digest.hexdigest()[:16]}.json")
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {c: bytes.fromhex(h) for c, h in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(path, bitmaps):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({c: b.hex() for c, b in bitmaps.items()}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def render_glyphs(font, chars):
+    """Returns {char: bitmap}, rendering only characters missing from the cache."""
+    path = cache_path()
+    bitmaps = load_cache(path)
+    missing = [c for c in chars if c not in bitmaps]
+    print(f"Glyph cache: {len(chars) - len(missing)} hit, {len(missing)} to render")
+
+    if len(missing) >= PARALLEL_MIN:
+        with ProcessPoolExecutor(initializer=_init_worker, initargs=(FONT_PATH, FONT_SIZE)) as pool:
+            for char, bitmap in pool.map(_render_worker, missing, chunksize=32):
+                bitmaps[char] = bitmap
+    else:
+        for char in missing:
+            bitmaps[char] = render_char_bitmap(font, char)
+
+    if missing:
+        save_cache(path, bitmaps)
+    return bitmaps
+
 def generate_font_file(chars):
     print(f"Generating font_zh.py and font_data.bin with {len(chars)} characters")
     
@@ -86,55 +138,176 @@ def generate_font_file(chars):
         print(f"Error: Could not load font at {FONT_PATH}")
         return
 
-    # 1. Generate Binary Data and Index
-    index = {}
+    # The lookup table stores 16-bit codepoints, so only BMP characters fit
+    chars = sorted(c for c in chars if ord(c) <= 0xFFFF)
+
+    bitmaps = render_glyphs(font, chars)
+
+    # 1. Generate Binary Data
+    # Layout: header | sorted codepoint table | glyph bitmaps (same order)
+    #   header = MAGIC (4) + count (u16 LE) + glyph size (u16 LE)
+    #   table  = count * u16 LE codepoints
+    #   glyphs = count * 32 bytes (16x16 = 256 bits)
     with open("font_data.bin", "wb") as bin_file:
-        offset = 0
+        bin_file.write(FONT_MAGIC)
+        bin_file.write(struct.pack("<HH", len(chars), GLYPH_BYTES))
+        for char in chars:
+            bin_file.write(struct.pack("<H", ord(char)))
         for char in chars:
-            bitmap = render_char_bitmap(font, char)
-            bin_file.write(bitmap)
-            index[char] = offset
-            offset += 32 # 16x16 = 256 bits = 32 bytes
+            bin_file.write(bitmaps[char])
 
     # 2. Generate Python Driver
     with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
         f.write("# Auto-generated by compile_font.py (File-Backed)\n")
-        f.write("import framebuf\n\n")
-        
-        # Write the Index
-        f.write("INDEX = {\n")
-        for char, off in index.items():
-            f.write(f'    "{char}": {off},\n')
-        f.write("}\n\n")
+        f.write("import framebuf\n")
+        f.write("from collections import OrderedDict\n\n")
         
         # Add the draw functions
-        f.write("""def draw_char(fb, char, x, y):
-    if char not in INDEX: return
-    offset = INDEX[char]
-    
-    # Read from file (Lazy Load)
+        f.write("""DATA_FILE = 'font_data.bin'
+CACHE_SIZE = 32 # Decoded glyphs kept in RAM (LRU)
+GLYPH_BYTES = 32
+HEADER_SIZE = 8
+
+_file = None
+_count = 0 # Number of glyphs, read from the header on open
+_probe = bytearray(2)
+_cache = OrderedDict() # char -> (bytearray, FrameBuffer), oldest first
+hits = 0
+misses = 0
+
+def _open():
+    global _file, _count
+    if _file is None:
+        f = open(DATA_FILE, 'rb')
+        header = f.read(HEADER_SIZE)
+        if header[:4] != b'FZH1':
+            f.close()
+            raise OSError('bad font_data.bin header')
+        _count = header[4] | (header[5] << 8)
+        _file = f
+    return _file
+
+def find(char):
+    \"\"\"Binary search the on-flash codepoint table. Returns the glyph number or -1.\"\"\"
+    code = ord(char)
     try:
-        with open('font_data.bin', 'rb') as f:
-            f.seek(offset)
-            data = f.read(32)
+        f = _open()
     except OSError:
-        return
+        return -1
+    lo = 0
+    hi = _count - 1
+    while lo <= hi:
+        mid = (lo + hi) >> 1
+        f.seek(HEADER_SIZE + mid * 2)
+        f.readinto(_probe)
+        value = _probe[0] | (_probe[1] << 8)
+        if value == code:
+            return mid
+        if value < code:
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return -1
+
+def has_glyph(char):
+    return char in _cache or find(char) >= 0
+
+def close():
+    global _file
+    if _file is not None:
+        _file.close()
+        _file = None
+
+def set_cache_size(size):
+    global CACHE_SIZE
+    CACHE_SIZE = max(1, size)
+    while len(_cache) > CACHE_SIZE:
+        _cache.pop(next(iter(_cache)))
+
+def cache_stats():
+    return {'size': len(_cache), 'max': CACHE_SIZE, 'hits': hits, 'misses': misses}
+
+def get_glyph(char):
+    global hits, misses
+    entry = _cache.pop(char, None)
+    if entry is not None:
+        hits += 1
+        _cache[char] = entry # Move to most recent
+        return entry[1]
 
-    char_fb = framebuf.FrameBuffer(bytearray(data), 16, 16, framebuf.MONO_HLSB)
-    fb.blit(char_fb, x, y)
+    if ord(char) < 128: return None
+    glyph_no = find(char)
+    if glyph_no < 0: return None
+    misses += 1
+
+    # Reuse the evicted glyph's buffer instead of allocating a new one
+    if len(_cache) >= CACHE_SIZE:
+        entry = _cache.pop(next(iter(_cache)))
+    else:
+        data = bytearray(GLYPH_BYTES)
+        entry = (data, framebuf.FrameBuffer(data, 16, 16, framebuf.MONO_HLSB))
+
+    try:
+        f = _open()
+        f.seek(HEADER_SIZE + _count * 2 + glyph_no * GLYPH_BYTES)
+        f.readinto(entry[0])
+    except OSError:
+        close()
+        return None
+
+    _cache[char] = entry
+    return entry[1]
+
+def draw_char(fb, char, x, y):
+    glyph = get_glyph(char)
+    if glyph is not None:
+        fb.blit(glyph, x, y)
+
+_run = [] # Glyphs of the CJK run being drawn
 
 def draw_text(fb, text, x, y):
     cursor = x
-    for char in text:
-        if char in INDEX:
-            draw_char(fb, char, cursor, y)
+    n = len(text)
+    i = 0
+    missing = -1 # Index of a non-ASCII char already found to have no glyph
+    while i < n:
+        # ASCII run, with '?' for characters that have no glyph, drawn by a
+        # single fb.text call
+        start = i
+        run = None # Only built when a '?' has to be substituted
+        while i < n:
+            code = ord(text[i])
+            if 32 <= code <= 126:
+                i += 1
+            elif code >= 128 and i != missing:
+                break
+            else:
+                run = (run or '') + text[start:i] + '?'
+                i += 1
+                start = i
+        if run is not None:
+            run += text[start:i]
+        elif i > start:
+            run = text[start:i]
+        if run:
+            fb.text(run, cursor, y + 4, 0)
+            cursor += len(run) * 8
+
+        # CJK run: look every glyph up first, then blit them. At most
+        # CACHE_SIZE at a time, since later misses reuse the LRU buffers.
+        while i < n and len(_run) < CACHE_SIZE:
+            if ord(text[i]) < 128:
+                break
+            glyph = get_glyph(text[i])
+            if glyph is None:
+                missing = i
+                break
+            _run.append(glyph)
+            i += 1
+        for glyph in _run:
+            fb.blit(glyph, cursor, y)
             cursor += 16
-        elif 32 <= ord(char) <= 126:
-            fb.text(char, cursor, y + 4, 0)
-            cursor += 8
-        else:
-            fb.text("?", cursor, y + 4, 0)
-            cursor += 8
+        _run.clear()
 """)
 
 if __name__ == "__main__":
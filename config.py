@@ -6,4 +6,15 @@ UTC_OFFSET = 28800
 
 # Weather Location (Beijing)
 LAT = 39.90
-LON = 116.40
\ No newline at end of file
+LON = 116.40
+
+# E-Paper partial refresh mode
+# "otp":  three passes of the controller's built-in fast waveform
+# "diff": one differential update using both RAM banks (old/new frame).
+#         Experimental: it loads the 30-byte LUT_PARTIAL, which has only
+#         been checked in tools/epd_sim.py, not on a real panel.
+EPD_PARTIAL_MODE = "otp"
+
+# Largest OTA package accepted. Packages are streamed to flash, so the real
+# limit is the free flash space, checked per upload; other routes keep 1 MB
+OTA_MAX_SIZE = 4 * 1024 * 1024
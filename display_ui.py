@@ -1,8 +1,16 @@
 import framebuf
 import weather_api
 import font_zh
+import text_layout
 import wifi_manager
+import config
+import il3820
+import frame_codec
+import playlist
+import refresh_planner
 import gc
+import time
+import ubinascii
 
 # 5x7 bit patterns for numbers 0-9 and :
 BIG_DIGITS = {
@@ -20,13 +28,34 @@ BIG_DIGITS = {
     ' ': (0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00),
 }
 
-def draw_big_char(fb, char, x, y, scale=3):
-    if char not in BIG_DIGITS: return
-    pattern = BIG_DIGITS[char]
-    for row_idx, row_val in enumerate(pattern):
+# Pre-rendered (char, scale) -> FrameBuffer. Built on first use (or by
+# init() for the clock scale) so drawing a digit is a single blit.
+big_glyphs = {}
+
+def render_big_char(char, scale):
+    w = 5 * scale
+    h = 7 * scale
+    glyph_buf = bytearray(((w + 7) // 8) * h)
+    glyph = framebuf.FrameBuffer(glyph_buf, w, h, framebuf.MONO_HLSB)
+    glyph.fill(0xFF)
+    for row_idx, row_val in enumerate(BIG_DIGITS[char]):
         for col_idx in range(5): 
             if (row_val >> (4 - col_idx)) & 1:
-                fb.fill_rect(x + col_idx * scale, y + row_idx * scale, scale, scale, 0x00)
+                glyph.fill_rect(col_idx * scale, row_idx * scale, scale, scale, 0x00)
+    return glyph
+
+def preload_big_digits(scale):
+    for char in BIG_DIGITS:
+        if (char, scale) not in big_glyphs:
+            big_glyphs[(char, scale)] = render_big_char(char, scale)
+
+def draw_big_char(fb, char, x, y, scale=3):
+    if char not in BIG_DIGITS: return
+    glyph = big_glyphs.get((char, scale))
+    if glyph is None:
+        glyph = big_glyphs[(char, scale)] = render_big_char(char, scale)
+    # White is transparent, like the old per-cell fill_rect drawing
+    fb.blit(glyph, x, y, 1)
 
 def draw_big_text(fb, text, x, y, scale=3):
     cursor_x = x
@@ -34,28 +63,31 @@ def draw_big_text(fb, text, x, y, scale=3):
         draw_big_char(fb, char, cursor_x, y, scale)
         cursor_x += (6 * scale) 
 
+CLOCK_SCALE = 3
+
 def draw_header(fb, date_str, time_str):
     # Top Bar (Date)
     fb.fill_rect(0, 0, 128, 24, 0x00)
     fb.text(date_str, 25, 8, 0xFF)
     
     # Big Time
-    draw_big_text(fb, time_str, 19, 40, scale=3)
+    draw_big_text(fb, time_str, 19, 40, scale=CLOCK_SCALE)
 
 def draw_footer(fb):
     # System Status
     fb.hline(0, 280, 128, 0x00)
     
-    # RAM (Gap Filler)
+    # IP Address
+    ip = wifi_manager.ip_address
+    fb.text(ip, 0, 285, 0x00)
+
+def draw_status(fb):
+    # RAM (Gap Filler) - changes every frame, so it is drawn over the body layer
     mem_free = gc.mem_free() // 1024
     ram_str = f"RAM: {mem_free} KB"
     ram_w = len(ram_str) * 8
     ram_x = (128 - ram_w) // 2
     fb.text(ram_str, ram_x, 240, 0x00)
-    
-    # IP Address
-    ip = wifi_manager.ip_address
-    fb.text(ip, 0, 285, 0x00)
 
 def draw_weather(fb):
     # 1. Location: Beijing (Centered)
@@ -69,7 +101,7 @@ def draw_weather(fb):
     
     # 3. Condition (Chinese) (Centered)
     desc = weather_api.cache["desc"]
-    desc_w = len(desc) * 16
+    desc_w = text_layout.measure(desc)
     desc_x = (128 - desc_w) // 2
     font_zh.draw_text(fb, desc, desc_x, 126)
     
@@ -85,83 +117,219 @@ def draw_weather(fb):
         fb.text(line, 0, y_pos, 0x00)
         y_pos += 15
 
+# Message box layout
+MSG_X = 10
+MSG_Y = 130
+MSG_WIDTH = 108
+MSG_LINE_HEIGHT = 20
+MSG_MAX_LINES = 5 # Lines at y=130..210 end at 226, clear of the RAM line at y=240
+
 def draw_message(fb, message):
     # Draw a box
     fb.rect(5, 90, 118, 180, 0x00)
     font_zh.draw_text(fb, "Message:", 10, 100)
     
-    words = message.split(' ')
-    y = 130
-    x = 10
-    for word in words:
-        if x + (len(word)*16) > 118:
-            x = 10
-            y += 20
-        font_zh.draw_text(fb, word, x, y)
-        x += (len(word) * 16) + 8 
-
-def draw_image(epd, buf):
+    y = MSG_Y
+    for line in text_layout.layout(message, MSG_WIDTH, MSG_MAX_LINES):
+        font_zh.draw_text(fb, line, MSG_X, y)
+        y += MSG_LINE_HEIGHT
+
+# --- Render Target ---
+# Allocated once by init() at boot and reused for every redraw, so the
+# per-minute update never touches the allocator.
+FRAME_SIZE = 128 * 296 // 8 # 4736 bytes
+ROW_BYTES = 128 // 8
+
+buf = None     # Frame being rendered
+fb = None      # FrameBuffer view over buf
+
+# Copy of the last frame written to the controller RAM. Partial updates
+# only resend the row bands that differ from it.
+last_frame = None
+have_last_frame = False
+frame_crc = 0 # CRC32 of last_frame, the ETag of /api/display/frame
+
+def init():
+    """Allocate the display buffers. Raises MemoryError if the heap is too small."""
+    global buf, fb, last_frame, body_layer
+    if buf is not None:
+        return
+    gc.collect()
+    buf = bytearray(FRAME_SIZE)
+    fb = framebuf.FrameBuffer(buf, 128, 296, framebuf.MONO_HLSB)
+    last_frame = bytearray(FRAME_SIZE)
+    body_layer = bytearray(FRAME_SIZE - BODY_OFFSET)
+    preload_big_digits(CLOCK_SCALE)
+
+# --- Static Body Layer ---
+# Everything below the clock (weather or message, footer line, IP) only
+# changes with the weather cache, the message or the IP. It is rendered once
+# into the frame, copied into body_layer, and copied back on later frames.
+BODY_Y = 80
+BODY_OFFSET = BODY_Y * ROW_BYTES
+body_layer = None
+body_key = None
+
+def draw_body(fb, message):
+    global body_key
+    key = (message, weather_api.cache["last_update"], wifi_manager.ip_address)
+    if key == body_key:
+        buf[BODY_OFFSET:] = body_layer
+        return
+
+    fb.fill_rect(0, BODY_Y, 128, 296 - BODY_Y, 0xFF)
+    if message:
+        draw_message(fb, message)
+    else:
+        draw_weather(fb)
+    draw_footer(fb)
+    body_layer[:] = memoryview(buf)[BODY_OFFSET:]
+    body_key = key
+
+# --- Dirty Rectangle Tracking ---
+SPAN_GAP = 8 # Merge bands closer than this many rows (saves window setup)
+
+def dirty_spans(old, new, gap=SPAN_GAP):
+    """Return [(y_start, y_end), ...] row bands where new differs from old."""
+    spans = []
+    start = -1
+    end = -1
+    rows = len(new) // ROW_BYTES
+    for row in range(rows):
+        i = row * ROW_BYTES
+        stop = i + ROW_BYTES
+        while i < stop:
+            if old[i] != new[i]:
+                break
+            i += 1
+        if i == stop:
+            continue
+        if start >= 0 and row - end <= gap:
+            end = row
+        else:
+            if start >= 0:
+                spans.append((start, end))
+            start = end = row
+    if start >= 0:
+        spans.append((start, end))
+    return spans
+
+# Set bits per byte value, for counting flipped pixels
+POPCOUNT = bytes(bin(i).count("1") for i in range(256))
+
+def flipped_pixels(old, new, spans):
+    """Number of pixels that differ between old and new within the row spans."""
+    count = 0
+    for y_start, y_end in spans:
+        for i in range(y_start * ROW_BYTES, (y_end + 1) * ROW_BYTES):
+            if old[i] != new[i]:
+                count += POPCOUNT[old[i] ^ new[i]]
+    return count
+
+FULL_SPAN = [(0, 295)]
+
+def send_frame(epd, spans=None):
+    """Push buf to the controller RAM: only the given row spans, or all of it."""
+    global have_last_frame, frame_crc
+    if spans is None:
+        spans = FULL_SPAN
+        epd.set_frame_memory(buf)
+    else:
+        for y_start, y_end in spans:
+            epd.set_frame_memory_rows(buf, y_start, y_end)
+        print(f"Dirty rows: {spans}")
+
+    last_frame[:] = buf
+    have_last_frame = True
+    frame_crc = ubinascii.crc32(last_frame)
+    return spans
+
+async def refresh(epd, spans, partial, flipped=0):
+    start = time.ticks_ms()
+    if not partial:
+        await epd.display_frame_async()
+    elif config.EPD_PARTIAL_MODE == "diff":
+        await epd.display_frame_partial_async()
+    else:
+        # Run OTP Partial three times to improve contrast
+        await epd.display_frame_otp_partial_async()
+        await epd.display_frame_otp_partial_async()
+        await epd.display_frame_otp_partial_async()
+    refresh_planner.record(partial, flipped, time.ticks_diff(time.ticks_ms(), start))
+
+    if config.EPD_PARTIAL_MODE == "diff":
+        # Bring the old-frame bank up to date so the next differential
+        # update compares against what is now on the panel
+        for y_start, y_end in spans:
+            epd.set_frame_memory_rows(buf, y_start, y_end, il3820.RAM_OLD)
+
+async def draw_image(epd, partial):
     try:
+        # Decode straight into the frame. On error draw_screen falls back
+        # to a message, which redraws every row of buf anyway.
         with open('image.bin', 'rb') as f:
-            f.readinto(buf)
-        # Direct render, skip other drawing
-        epd._command(0x4E, bytearray([0x00]))
-        epd._command(0x4F, bytearray([0x00, 0x00]))
-        epd.set_frame_memory(buf)
-        epd.display_frame()
-        return True
+            frame_codec.decode(f, buf)
     except Exception as e:
         print(f"Load Image Error: {e}")
         return False
+    # Direct render, skip other drawing. An unchanged image (every minute
+    # tick) is skipped like any other unchanged frame.
+    await present(epd, partial)
+    return True
+
+async def draw_playlist(epd):
+    # Next slideshow frame straight into buf
+    try:
+        if await playlist.show_next(buf) < 0:
+            print("Playlist is empty")
+            return False
+    except Exception as e:
+        print(f"Playlist Error: {e}")
+        return False
+    await present(epd, partial=True)
+    return True
+
+async def present(epd, partial):
+    # Partial updates only resend the changed rows, unless the planner
+    # decides the accumulated ghosting calls for a full refresh
+    spans = None
+    flipped = 0
+    if partial and have_last_frame:
+        if buf == last_frame:
+            print("Frame unchanged, skipping refresh")
+            return
+        spans = dirty_spans(last_frame, buf)
+        flipped = flipped_pixels(last_frame, buf, spans)
+        if not refresh_planner.allow_partial(flipped):
+            print(f"Full refresh ({refresh_planner.last_reason})")
+            spans = None
+    partial = spans is not None
 
-def draw_screen(epd, time_str, date_str, message="", partial=False):
+    spans = send_frame(epd, spans)
+    await refresh(epd, spans, partial, flipped)
+
+async def draw_screen(epd, time_str, date_str, message="", partial=False):
     print(f"Drawing: {time_str} Msg: {message} Partial: {partial}")
     
-    # 1. Clear RAM for the big buffer
-    gc.collect()
-    
-    try:
-        # Create a buffer (128 * 296 / 8 = 4736 bytes)
-        buf = bytearray(128 * 296 // 8)
-        fb = framebuf.FrameBuffer(buf, 128, 296, framebuf.MONO_HLSB)
-        
-        # --- IMAGE MODE ---
-        if message == "__IMAGE__":
-            if draw_image(epd, buf):
-                return
-            else:
-                message = "Image Error" # Fallback
-
-        # --- NORMAL MODE ---
-        fb.fill(0xFF) # White background
-
-        draw_header(fb, date_str, time_str)
-        
-        if message:
-            draw_message(fb, message)
+    # --- IMAGE MODE ---
+    if message == "__IMAGE__":
+        if await draw_image(epd, partial):
+            return
         else:
-            draw_weather(fb)
-            
-        draw_footer(fb)
-
-        # Send to Display
-        epd._command(0x4E, bytearray([0x00]))
-        epd._command(0x4F, bytearray([0x00, 0x00]))
-        
-        epd.set_frame_memory(buf)
-        
-        if partial:
-            # Run OTP Partial twice to improve contrast
-            epd.display_frame_otp_partial()
-            epd.display_frame_otp_partial()
-            epd.display_frame_otp_partial()
+            message = "Image Error" # Fallback
+
+    # --- PLAYLIST MODE ---
+    if message == playlist.MODE:
+        if await draw_playlist(epd):
+            return
         else:
-            epd.display_frame()
-        
-    except MemoryError:
-        print("Display Error: Out of RAM!")
-    finally:
-        # Clean up aggressively
-        if 'fb' in locals(): del fb
-        if 'buf' in locals(): del buf
-        gc.collect()
\ No newline at end of file
+            message = "No Playlist" # Fallback (retried every minute)
+
+    # --- NORMAL MODE ---
+    fb.fill_rect(0, 0, 128, BODY_Y, 0xFF) # White background (header area)
+
+    draw_header(fb, date_str, time_str)
+    draw_body(fb, message)
+    draw_status(fb)
+
+    await present(epd, partial)
@@ -51,6 +51,8 @@ def prepare_build():
     # 4. Copy WWW
     if os.path.exists("www"):
         shutil.copytree("www", os.path.join(BUILD_DIR, "www"))
+        # gzip variants + content hashes (www/manifest.json)
+        subprocess.run([sys.executable, "tools/build_www.py", os.path.join(BUILD_DIR, "www")], check=True)
 
 def main():
     if not os.path.exists(PORT):
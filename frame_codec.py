@@ -0,0 +1,217 @@
+import io
+import ustruct
+import ubinascii
+
+# --- 1bpp Frame Storage Formats ---
+# image.bin holds MAGIC + format byte + payload. A file without the magic is
+# a legacy raw frame (the old upload format, exactly FRAME_SIZE bytes).
+#
+#   raw:     FRAME_SIZE bytes, MONO_HLSB
+#   rle:     PackBits. Header byte n: 0..127 -> n+1 literal bytes follow,
+#            129..255 -> next byte repeated 257-n times, 128 -> no-op
+#   deflate: zlib stream (RFC 1950), as produced by zlib.compress()
+
+WIDTH = 128
+HEIGHT = 296
+FRAME_SIZE = WIDTH * HEIGHT // 8 # 4736 bytes
+
+MAGIC = b"EPF"
+HEADER_SIZE = 4
+
+FMT_RAW = 0
+FMT_RLE = 1
+FMT_DEFLATE = 2
+FORMATS = {"raw": FMT_RAW, "rle": FMT_RLE, "deflate": FMT_DEFLATE}
+
+# Largest payload accepted for upload. The encoders in the web UI and
+# tools/convert_image.py only start a run at 3+ equal bytes, so their RLE of
+# incompressible data grows by at most 1 byte per 128.
+MAX_PAYLOAD = FRAME_SIZE + FRAME_SIZE // 64
+
+STORED_MAX = HEADER_SIZE + MAX_PAYLOAD # Largest stored frame (header + payload)
+
+CHUNK_SIZE = 256
+_chunk = bytearray(CHUNK_SIZE)
+_chunk_mv = memoryview(_chunk)
+
+class BufferReader(io.IOBase):
+    """Read-only file over the first length bytes of a buffer, so a stored
+    frame already in RAM can be passed to decode() without copying it."""
+    def __init__(self, data, length):
+        self._mv = memoryview(data)[:length]
+        self._pos = 0
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self._mv) - self._pos)
+        buf[:n] = self._mv[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def read(self, n=-1):
+        end = len(self._mv) if n < 0 else min(self._pos + n, len(self._mv))
+        data = bytes(self._mv[self._pos:end])
+        self._pos = end
+        return data
+
+    def seek(self, pos):
+        self._pos = pos
+
+def header(fmt):
+    return MAGIC + bytes((fmt,))
+
+def read_header(f):
+    """Return the format of the stored frame in f, leaving f at its payload."""
+    head = f.read(HEADER_SIZE)
+    if head[:3] == MAGIC and len(head) == HEADER_SIZE:
+        return head[3]
+    f.seek(0) # Legacy headerless raw frame
+    return FMT_RAW
+
+def _open_deflate(f):
+    try:
+        import deflate
+        return deflate.DeflateIO(f, deflate.ZLIB)
+    except ImportError:
+        pass
+    try:
+        import uzlib
+        return uzlib.DecompIO(f, 15)
+    except ImportError:
+        raise ValueError("deflate not supported")
+
+def _read_stream(stream, out, size):
+    # Copy a raw (or already inflated) stream into out; with out=None only
+    # count. Returns the byte count, reading at most one byte past size.
+    n = 0
+    if out is not None:
+        mv = memoryview(out)
+        while n < size:
+            k = stream.readinto(mv[n:size])
+            if not k:
+                break
+            n += k
+    else:
+        while n <= size:
+            k = stream.readinto(_chunk)
+            if not k:
+                break
+            n += k
+    if n == size and stream.read(1):
+        n += 1
+    return n
+
+def _decode_rle(f, out, size):
+    pos = 0
+    literal = 0  # Literal bytes still to copy
+    repeat = 0   # Length of a run whose value byte is still to come
+    while True:
+        n = f.readinto(_chunk)
+        if not n:
+            break
+        i = 0
+        while i < n:
+            if literal:
+                k = min(literal, n - i, size - pos)
+                if k <= 0:
+                    raise ValueError("rle data too long")
+                if out is not None:
+                    out[pos:pos + k] = _chunk_mv[i:i + k]
+                pos += k
+                i += k
+                literal -= k
+            elif repeat:
+                if pos + repeat > size:
+                    raise ValueError("rle data too long")
+                if out is not None:
+                    value = _chunk[i]
+                    for j in range(pos, pos + repeat):
+                        out[j] = value
+                pos += repeat
+                repeat = 0
+                i += 1
+            else:
+                code = _chunk[i]
+                if code < 128:
+                    literal = code + 1
+                elif code > 128:
+                    repeat = 257 - code
+                i += 1
+    if literal or repeat:
+        raise ValueError("truncated rle data")
+    return pos
+
+def decode(f, out=None, size=FRAME_SIZE):
+    """
+    Decode the stored frame in file f into out (size bytes, e.g. the display
+    buffer). With out=None the data is only checked. Raises ValueError unless
+    it decodes to exactly size bytes.
+    """
+    fmt = read_header(f)
+    if fmt == FMT_RAW:
+        n = _read_stream(f, out, size)
+    elif fmt == FMT_RLE:
+        n = _decode_rle(f, out, size)
+    elif fmt == FMT_DEFLATE:
+        n = _read_stream(_open_deflate(f), out, size)
+    else:
+        raise ValueError(f"unknown frame format {fmt}")
+    if n > size:
+        raise ValueError(f"frame data too long, expected {size} bytes")
+    if n != size:
+        raise ValueError(f"frame decodes to {n} bytes, expected {size}")
+    return fmt
+
+# --- PNG Preview ---
+# 1-bit grayscale PNG (0 = black, 1 = white, same as MONO_HLSB) with the
+# image data in a single stored (uncompressed) deflate block, so no
+# compressor is needed and the size is known up front.
+PNG_GROUP_ROWS = 16 # Rows converted per yielded piece
+
+def png_size(width=WIDTH, height=HEIGHT):
+    raw = height * (1 + width // 8)
+    return 8 + 25 + (12 + 2 + 5 + raw + 4) + 12
+
+def _png_chunk_header(tag, length):
+    head = ustruct.pack(">I", length) + tag
+    return head, ubinascii.crc32(tag)
+
+def _adler32(data, adler):
+    a = adler & 0xFFFF
+    b = adler >> 16
+    for x in data:
+        a += x
+        b += a
+    return ((b % 65521) << 16) | (a % 65521)
+
+def png_chunks(frame, width=WIDTH, height=HEIGHT):
+    """Yield frame as a PNG, a few rows at a time (see png_size())."""
+    row_bytes = width // 8
+    raw = height * (1 + row_bytes)
+    ihdr = ustruct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0)
+    head, crc = _png_chunk_header(b"IHDR", len(ihdr))
+    yield b"\x89PNG\r\n\x1a\n" + head + ihdr + ustruct.pack(">I", ubinascii.crc32(ihdr, crc))
+
+    # zlib header, then one final stored block: LEN, NLEN
+    head, crc = _png_chunk_header(b"IDAT", 2 + 5 + raw + 4)
+    start = b"\x78\x01\x01" + ustruct.pack("<HH", raw, raw ^ 0xFFFF)
+    crc = ubinascii.crc32(start, crc)
+    yield head + start
+
+    mv = memoryview(frame)
+    rows = bytearray(PNG_GROUP_ROWS * (1 + row_bytes))
+    adler = 1
+    for y in range(0, height, PNG_GROUP_ROWS):
+        n = min(PNG_GROUP_ROWS, height - y)
+        for i in range(n):
+            # Filter byte 0 (None) in front of each row
+            o = i * (1 + row_bytes)
+            rows[o] = 0
+            rows[o + 1:o + 1 + row_bytes] = mv[(y + i) * row_bytes:(y + i + 1) * row_bytes]
+        piece = memoryview(rows)[:n * (1 + row_bytes)]
+        adler = _adler32(piece, adler)
+        crc = ubinascii.crc32(piece, crc)
+        yield piece
+
+    tail = ustruct.pack(">I", adler)
+    crc = ubinascii.crc32(tail, crc)
+    yield tail + ustruct.pack(">I", crc) + ustruct.pack(">I", 0) + b"IEND" + ustruct.pack(">I", ubinascii.crc32(b"IEND"))
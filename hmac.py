@@ -1,31 +1,92 @@
 import hashlib
 
-def new(key, msg, digestmod):
-    """
-    Minimal HMAC implementation.
-    """
-    block_size = 64 # for sha256
-    
-    if len(key) > block_size:
-        key = digestmod(key).digest()
-    if len(key) < block_size:
-        key = key + b'\x00' * (block_size - len(key))
-        
-    o_key_pad = bytes(x ^ 0x5c for x in key)
-    i_key_pad = bytes(x ^ 0x36 for x in key)
-    
-    return HMAC(o_key_pad, i_key_pad, digestmod, msg)
+# --- HMAC (RFC 2104) ---
+# The subset of CPython's hmac module the firmware needs, so the same code
+# runs on the host for testing. Messages can be fed in pieces with update().
+#
+# MicroPython's hash objects have no copy() and digest() finalizes them, so
+# digest() is computed once and cached; update() after it is an error.
+# A keyed object that has not been fed yet can always be copy()-ed, which
+# reuses the padded key instead of deriving it again for every message.
+
+def _resolve(digestmod):
+    if digestmod is None:
+        raise TypeError("Missing required parameter 'digestmod'.")
+    if isinstance(digestmod, str):
+        return getattr(hashlib, digestmod)
+    return digestmod
 
 class HMAC:
-    def __init__(self, o_key, i_key, digestmod, msg):
-        self.o_key = o_key
-        self.i_key = i_key
-        self.digestmod = digestmod
-        self.inner = digestmod(i_key)
-        self.inner.update(msg)
-        
+    blocksize = 64
+
+    def __init__(self, key, msg=None, digestmod=None):
+        self._cons = _resolve(digestmod)
+        probe = self._cons()
+        self.block_size = getattr(probe, "block_size", 64)
+        self.digest_size = getattr(probe, "digest_size", 0) or len(probe.digest())
+        self.name = "hmac-" + (getattr(probe, "name", "") or self._cons.__name__)
+
+        if len(key) > self.block_size:
+            key = self._cons(key).digest()
+        key = key + b'\x00' * (self.block_size - len(key))
+        self._i_key = bytes(x ^ 0x36 for x in key)
+        self._o_key = bytes(x ^ 0x5c for x in key)
+
+        self._reset()
+        if msg is not None:
+            self.update(msg)
+
+    def _reset(self):
+        self._inner = self._cons(self._i_key)
+        self._fed = False
+        self._digest = None
+
+    def update(self, msg):
+        if self._digest is not None and not hasattr(self._inner, "copy"):
+            raise ValueError("update() after digest()")
+        self._inner.update(msg)
+        self._fed = True
+        self._digest = None
+
+    def copy(self):
+        """A new HMAC with the same key and the message so far."""
+        other = HMAC.__new__(HMAC)
+        other._cons = self._cons
+        other.block_size = self.block_size
+        other.digest_size = self.digest_size
+        other.name = self.name
+        other._i_key = self._i_key
+        other._o_key = self._o_key
+        if not self._fed:
+            other._reset()
+        elif hasattr(self._inner, "copy"):
+            other._inner = self._inner.copy()
+            other._fed = True
+            other._digest = self._digest
+        else:
+            raise ValueError("copy() needs a hash with copy() once data is fed")
+        return other
+
     def digest(self):
-        inner_hash = self.inner.digest()
-        outer = self.digestmod(self.o_key)
-        outer.update(inner_hash)
-        return outer.digest()
+        if self._digest is None:
+            # Digest a copy where possible, so update() can continue after
+            inner = self._inner.copy() if hasattr(self._inner, "copy") else self._inner
+            outer = self._cons(self._o_key)
+            outer.update(inner.digest())
+            self._digest = outer.digest()
+        return self._digest
+
+    def hexdigest(self):
+        return "".join("%02x" % b for b in self.digest())
+
+def new(key, msg=None, digestmod=None):
+    return HMAC(key, msg, digestmod)
+
+def compare_digest(a, b):
+    """Compare in time independent of where the first difference is."""
+    if len(a) != len(b):
+        return False
+    diff = 0
+    for x, y in zip(a, b):
+        diff |= x ^ y
+    return diff == 0
@@ -1,9 +1,15 @@
 import time
+import uasyncio
 
 # Display resolution
 EPD_WIDTH = 128
 EPD_HEIGHT = 296
 
+# RAM banks. For differential (partial LUT) updates the controller compares
+# the new frame in RAM_NEW against the previous one in RAM_OLD.
+RAM_NEW = 0x24 # WRITE_RAM (Black/White)
+RAM_OLD = 0x26 # WRITE_RAM (Red / previous frame)
+
 # Partial Refresh LUT (Generic 2.9")
 LUT_PARTIAL = bytearray([
     0x10, 0x18, 0x18, 0x08, 0x18, 0x18, 0x08, 0x00, 
@@ -12,6 +18,42 @@ LUT_PARTIAL = bytearray([
     0x00, 0x00, 0x00, 0x00, 0x00, 0x00
 ])
 
+class Sequence:
+    """
+    A batch of commands sent with a single CS assertion.
+
+    spec is a flat list: command, argument count, arguments..., repeated.
+    The memoryviews for every command/argument slice are built once here,
+    so running the sequence allocates nothing. Arguments can be patched in
+    place through args(i) before each run.
+    """
+    def __init__(self, spec):
+        self.buf = bytearray(spec)
+        mv = memoryview(self.buf)
+        self.parts = []
+        i = 0
+        while i < len(self.buf):
+            n = self.buf[i + 1]
+            self.parts.append((mv[i:i + 1], mv[i + 2:i + 2 + n] if n else None))
+            i += 2 + n
+
+    def args(self, index):
+        return self.parts[index][1]
+
+    def set_command(self, index, command):
+        self.parts[index][0][0] = command
+
+# Power-on configuration, sent after SWRESET
+INIT_SEQUENCE = Sequence([
+    0x01, 3, (EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF, 0x00,  # Driver output control
+    0x11, 1, 0x03,  # Data entry mode
+    0x44, 2, 0x00, (EPD_WIDTH // 8) - 1,  # Set Ram-X address start/end position
+    0x45, 4, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF,  # Set Ram-Y address start/end position
+    0x3C, 1, 0x05,  # BorderWaveform
+    0x21, 2, 0x00, 0x80,  # Display update control
+    0x18, 1, 0x80,  # Read built-in temperature sensor
+])
+
 class EPD:
     def __init__(self, spi, cs, dc, busy, rst=None):
         self.spi = spi
@@ -30,15 +72,56 @@ class EPD:
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
 
+        # Preallocated buffers so the refresh path creates no garbage
+        self._cmd_buf = bytearray(1)
+        self._arg_buf = bytearray(4)
+        mv = memoryview(self._arg_buf)
+        self._arg_views = [None, mv[:1], mv[:2], mv[:3], mv[:4]]
+        self._image = None
+        self._image_mv = None
+
+        # RAM window + address pointer + WRITE_RAM, Y patched per band
+        self._window = Sequence([
+            0x44, 2, 0, (EPD_WIDTH // 8) - 1,
+            0x45, 4, 0, 0, 0, 0,
+            0x4E, 1, 0,
+            0x4F, 2, 0, 0,
+            0x24, 0,
+        ])
+        # Display Update Control 2 + MASTER_ACTIVATION
+        self._update = Sequence([0x22, 1, 0xF7, 0x20, 0])
+
     def _command(self, command, data=None):
         self.cs(1)
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([command]))
+        self._cmd_buf[0] = command
+        self.spi.write(self._cmd_buf)
         self.cs(1)
         if data is not None:
             self._data(data)
 
+    def _command_args(self, command, n, a=0, b=0, c=0, d=0):
+        # Command with up to 4 argument bytes, sent from the shared buffer
+        args = self._arg_buf
+        args[0] = a
+        args[1] = b
+        args[2] = c
+        args[3] = d
+        self._command(command, self._arg_views[n])
+
+    def run_sequence(self, seq):
+        # Whole batch in one CS assertion; only DC toggles between parts
+        self.cs(1)
+        self.cs(0)
+        for cmd, data in seq.parts:
+            self.dc(0)
+            self.spi.write(cmd)
+            if data is not None:
+                self.dc(1)
+                self.spi.write(data)
+        self.cs(1)
+
     def _data(self, data):
         self.cs(1)
         self.dc(1)
@@ -58,26 +141,27 @@ class EPD:
 
         self._command(0x12)  # SWRESET
         self.wait_until_idle()
-
-        self._command(
-            0x01,
-            bytearray([(EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF, 0x00]),
-        )  # Driver output control
-        self._command(0x11, bytearray([0x03]))  # Data entry mode
-        self._command(
-            0x44, bytearray([0x00, (EPD_WIDTH // 8) - 1])
-        )  # Set Ram-X address start/end position
-        self._command(
-            0x45,
-            bytearray(
-                [0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF]
-            ),
-        )  # Set Ram-Y address start/end position
-        self._command(0x3C, bytearray([0x05]))  # BorderWaveform
-        self._command(0x21, bytearray([0x00, 0x80]))  #  Display update control
-        self._command(0x18, bytearray([0x80]))  # Read built-in temperature sensor
+        self._configure()
         self.wait_until_idle()
 
+    async def init_async(self):
+        # Same as init(), but yields to the event loop while the panel is busy
+        if self.rst:
+            self.rst(1)
+            await uasyncio.sleep_ms(200)
+            self.rst(0)
+            await uasyncio.sleep_ms(200)
+            self.rst(1)
+            await uasyncio.sleep_ms(200)
+
+        self._command(0x12)  # SWRESET
+        await self.wait_until_idle_async()
+        self._configure()
+        await self.wait_until_idle_async()
+
+    def _configure(self):
+        self.run_sequence(INIT_SEQUENCE)
+
     def wait_until_idle(self):
         if self.busy:
             while self.busy.value() == 1:
@@ -85,26 +169,74 @@ class EPD:
         else:
             time.sleep_ms(2000)  # type: ignore
 
-    def set_frame_memory(self, image):
-        self._command(0x24)  # WRITE_RAM (Black/White)
+    async def wait_until_idle_async(self):
+        if self.busy:
+            while self.busy.value() == 1:
+                await uasyncio.sleep_ms(20)
+        else:
+            await uasyncio.sleep_ms(2000)
+
+    def _begin_ram_write(self, y_start, y_end, ram):
+        # Full-width window over rows y_start..y_end, pointer at its start,
+        # then WRITE_RAM into the given bank, all in one CS assertion
+        seq = self._window
+        seq.set_command(4, ram)
+        y_args = seq.args(1)
+        y_args[0] = y_start & 0xFF
+        y_args[1] = (y_start >> 8) & 0xFF
+        y_args[2] = y_end & 0xFF
+        y_args[3] = (y_end >> 8) & 0xFF
+        p_args = seq.args(3)
+        p_args[0] = y_start & 0xFF
+        p_args[1] = (y_start >> 8) & 0xFF
+        self.run_sequence(seq)
+
+    def set_frame_memory(self, image, ram=RAM_NEW):
+        self._begin_ram_write(0, self.height - 1, ram)
         self._data(image)
 
+    def set_frame_memory_rows(self, image, y_start, y_end, ram=RAM_NEW):
+        # Only rewrite rows y_start..y_end (inclusive) of a full frame buffer.
+        # The rest of the controller RAM keeps whatever was sent before.
+        if image is not self._image:
+            self._image = image
+            self._image_mv = memoryview(image)
+        row_bytes = self.width // 8
+        self._begin_ram_write(y_start, y_end, ram)
+        self._data(self._image_mv[y_start * row_bytes:(y_end + 1) * row_bytes])
+
+    def _start_update(self, sequence):
+        self._update.args(0)[0] = sequence
+        self.run_sequence(self._update)
+
     def display_frame(self):
-        self._command(0x22, bytearray([0xF7]))
-        self._command(0x20)
+        self._start_update(0xF7)
         self.wait_until_idle()
 
+    async def display_frame_async(self):
+        self._start_update(0xF7)
+        await self.wait_until_idle_async()
+
     def display_frame_partial(self):
+        # Differential update: one waveform pass driven by RAM_NEW vs RAM_OLD,
+        # so RAM_OLD must hold what the panel currently shows
         self._command(0x32, LUT_PARTIAL)
-        self._command(0x22, bytearray([0xC7]))
-        self._command(0x20)
+        self._start_update(0xC7)
         self.wait_until_idle()
 
+    async def display_frame_partial_async(self):
+        self._command(0x32, LUT_PARTIAL)
+        self._start_update(0xC7)
+        await self.wait_until_idle_async()
+
     def display_frame_otp_partial(self):
         # Try Standard Fast Mode (0xFF loads OTP LUT Mode 2)
-        self._command(0x22, bytearray([0xFF])) 
-        self._command(0x20)
+        self._start_update(0xFF)
         self.wait_until_idle()
 
+    async def display_frame_otp_partial_async(self):
+        self._start_update(0xFF)
+        await self.wait_until_idle_async()
+
     def sleep(self):
-        self._command(0x10, bytearray([0x01]))
+        self._command_args(0x10, 1, 0x01)
@@ -11,6 +11,7 @@ import time
 import config
 import sd_manager
 import logger
+import playlist
 
 # --- Hardware Setup (Relocated for SD Card) ---
 # SCK=4, MOSI=5, CS=6, DC=7, BUSY=16
@@ -47,52 +48,68 @@ async def weather_task():
 async def ui_task():
     last_time_str = ""
     last_msg_str = ""
-    refresh_count = 0
+    last_version = -1
+    display_event = web_server.display_event
     
     while True:
+        # Clear before reading state, so a change made while we are
+        # drawing still wakes the next wait immediately
+        display_event.clear()
         t_str, d_str, _ = get_local_time()
         msg_str = web_server.custom_message
+        version = web_server.display_version
         
         time_changed = (t_str != last_time_str)
-        msg_changed = (msg_str != last_msg_str)
+        msg_changed = (msg_str != last_msg_str) or (version != last_version)
+        
+        slideshow = msg_str == playlist.MODE and playlist.showing
+        if slideshow:
+            # No clock on screen; only redraw when the slot is due
+            time_changed = False
+            msg_changed = msg_changed or playlist.due()
         
         if time_changed or msg_changed:
-            partial = False
-            
-            # Use Partial if only time changed and count < 30
-            if time_changed and not msg_changed:
-                partial = True
-                refresh_count += 1
-                if refresh_count > 30: # Full refresh every 30 updates (30 mins)
-                    partial = False
-                    refresh_count = 0
-            else:
-                # Message changed, full refresh
-                refresh_count = 0
-                partial = False
-
             if time_changed: led_manager.led_minute_update()
             if msg_changed: led_manager.led_web_request()
             
-            display_ui.draw_screen(epd, t_str, d_str, msg_str, partial=partial)
+            # Always offer a partial update; refresh_planner falls back to a
+            # full refresh when the accumulated changes call for it
+            await display_ui.draw_screen(epd, t_str, d_str, msg_str, partial=True)
             led_manager.led_off()
             
             last_time_str = t_str
             last_msg_str = msg_str
+            last_version = version
             gc.collect()
         
-        await uasyncio.sleep(0.1)
+        # Sleep until the next minute boundary (next slot in a slideshow),
+        # or until the web server reports a message/image change
+        if msg_str == playlist.MODE and playlist.showing:
+            delay = playlist.seconds_left()
+        else:
+            delay = 60 - (time.time() + config.UTC_OFFSET) % 60
+        try:
+            await uasyncio.wait_for(display_event.wait(), delay)
+        except uasyncio.TimeoutError:
+            pass
 
 async def main_loop():
     logger.info("Init System...")
     
+    # Allocate frame buffers first, while the heap is still unfragmented
+    try:
+        display_ui.init()
+    except MemoryError:
+        logger.error("Display Error: Out of RAM for frame buffers!")
+    
     # Init SD Card
     if sd_manager.mount_sd():
         logger.info("SD Mounted")
+        playlist.init()
     else:
         logger.info("SD Mount Failed (Skipping)")
     
-    epd.init()
+    await epd.init_async()
 
     # Initial Connection
     if wifi_manager.connect():
@@ -109,14 +126,17 @@ async def main_loop():
     else:
         # AP Mode started
         import dnserver
+        import captive_portal
         dnserver.start(wifi_manager.ip_address)
+        captive_portal.init(wifi_manager.ip_address)
     
     # Start Web Server (Background Task)
     uasyncio.create_task(web_server.start_server())
     
     uasyncio.create_task(heartbeat_task())
     uasyncio.create_task(weather_task())
-    uasyncio.create_task(ui_task())
+    if display_ui.buf is not None:
+        uasyncio.create_task(ui_task())
     
     logger.info(f"System Running. Free RAM: {gc.mem_free()}")
     while True:
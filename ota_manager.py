@@ -8,59 +8,86 @@ import hmac
 KEYS_DIR = "/keys"
 LEGACY_KEY = "secret.key"
 
-def verify_signature(zip_data, signature):
-    # 1. Try Keys Directory
+UPDATE_FILE = "/update.zip"
+PART_FILE = "/update.zip.part"
+CHUNK_SIZE = 1024
+
+def load_keys():
+    """[(name, key bytes), ...] for every key that may sign an update."""
+    keys = []
+    # 1. Keys Directory
     try:
-        key_files = uos.listdir(KEYS_DIR)
-        for kf in key_files:
+        for kf in uos.listdir(KEYS_DIR):
             try:
                 with open(f"{KEYS_DIR}/{kf}", "r") as f:
-                    key_hex = f.read().strip()
-                    key = ubinascii.unhexlify(key_hex)
-                
-                calc_sig = hmac.new(key, zip_data, hashlib.sha256).digest()
-                if calc_sig == signature:
-                    print(f"Signature Validated by {kf}")
-                    return True
+                    keys.append((kf, ubinascii.unhexlify(f.read().strip())))
             except Exception as e:
                 print(f"Key Error {kf}: {e}")
     except OSError:
         pass # Dir doesn't exist
 
-    # 2. Try Legacy Key
+    # 2. Legacy Key
     try:
         with open(LEGACY_KEY, "r") as f:
-            key_hex = f.read().strip()
-            key = ubinascii.unhexlify(key_hex)
-        
-        calc_sig = hmac.new(key, zip_data, hashlib.sha256).digest()
-        if calc_sig == signature:
-            print("Signature Validated by Legacy Key")
-            return True
+            keys.append(("Legacy Key", ubinascii.unhexlify(f.read().strip())))
     except:
         pass
-        
-    return False
+    return keys
+
+async def receive(stream, size, signature):
+    """
+    Copy size bytes from stream to PART_FILE, HMAC-ing them on the way with
+    every known key. Only a correctly signed package is renamed to
+    UPDATE_FILE. Returns True if the signature matched.
+    """
+    macs = [(name, hmac.new(key, digestmod=hashlib.sha256)) for name, key in load_keys()]
+    if not macs:
+        print("Verification Failed: No keys installed.")
+        return False
+
+    print(f"Receiving update ({size} bytes)...")
+    remaining = size
+    with open(PART_FILE, "wb") as f:
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            f.write(chunk)
+            for _, mac in macs:
+                mac.update(chunk)
+            remaining -= len(chunk)
+
+    valid = None
+    if remaining == 0:
+        print("Verifying signature (HMAC-SHA256)...")
+        for name, mac in macs:
+            if hmac.compare_digest(mac.digest(), signature):
+                valid = name
+                break
+    else:
+        print(f"Upload incomplete ({remaining} bytes missing)")
 
-def verify_and_install(zip_data, signature):
-    print("Verifying signature (HMAC-SHA256)...")
-    
-    if not verify_signature(zip_data, signature):
+    if valid is None:
         print("Verification Failed: No matching key found.")
+        try: uos.remove(PART_FILE)
+        except OSError: pass
         return False
 
-    print("Writing update.zip...")
-    with open("/update.zip", "wb") as f:
-        f.write(zip_data)
-    
+    print(f"Signature Validated by {valid}")
+    try: uos.remove(UPDATE_FILE)
+    except OSError: pass
+    uos.rename(PART_FILE, UPDATE_FILE)
+    return True
+
+def install():
     print("Unpacking...")
     import unzip
     try:
-        unzip.extract("/update.zip", "/")
+        unzip.extract(UPDATE_FILE, "/")
     except Exception as e:
         print(f"Unzip Failed: {e}")
         return False
-    
+
     print("Update Installed. Rebooting...")
     import uasyncio
     async def reboot_later():
@@ -70,5 +97,11 @@ def verify_and_install(zip_data, signature):
         uasyncio.create_task(reboot_later())
     except:
         machine.reset()
-        
-    return True
\ No newline at end of file
+
+    return True
+
+async def receive_and_install(stream, size, signature):
+    gc.collect()
+    if not await receive(stream, size, signature):
+        return False
+    return install()
@@ -0,0 +1,190 @@
+import os
+import time
+import ustruct
+import uasyncio
+import frame_codec
+
+# --- SD Card Slideshow ---
+# Frames live on the card as /sd/playlist/NN.epf (frame_codec format), one
+# file per slot. index.bin holds one fixed-size record per slot, so looking
+# a slot up is a single seek. The whole index (MAX_SLOTS * RECORD_SIZE
+# bytes) is also kept in RAM and written through on change.
+#
+# While a frame is shown, the next one is read from the card into RAM in
+# small chunks, yielding between them, so the web server keeps running.
+
+MODE = "__PLAYLIST__" # web_server.custom_message value that plays the list
+
+DIR = "/sd/playlist"
+INDEX_FILE = DIR + "/index.bin"
+MAX_SLOTS = 32
+DEFAULT_DURATION = 300 # Seconds per slot
+MIN_DURATION = 10
+
+# Record: used (u8), format (u8), duration s (u16), stored size (u32)
+RECORD_FORMAT = "<BBHI"
+RECORD_SIZE = 8
+
+READ_CHUNK = 512
+
+available = False
+_index = None
+
+current = -1   # Slot on screen (or last shown)
+showing = False # A playlist frame is on screen
+due_at = 0     # time.time() when the next slot is due
+
+# Prefetched stored frame (header + payload) of slot _payload_slot
+_payload = None
+_payload_len = 0
+_payload_slot = -1
+_lock = uasyncio.Lock()
+
+def slot_path(slot):
+    return f"{DIR}/{slot:02d}.epf"
+
+def init():
+    """Load the index from the card. Call after sd_manager.mount_sd()."""
+    global available, _index
+    try:
+        try: os.mkdir(DIR)
+        except OSError: pass
+        _index = bytearray(MAX_SLOTS * RECORD_SIZE)
+        try:
+            with open(INDEX_FILE, "rb") as f:
+                f.readinto(_index)
+        except OSError:
+            with open(INDEX_FILE, "wb") as f:
+                f.write(_index)
+        available = True
+    except Exception as e:
+        print(f"Playlist Init Error: {e}")
+        available = False
+
+def get_record(slot):
+    """(used, format, duration, size) of a slot."""
+    return ustruct.unpack_from(RECORD_FORMAT, _index, slot * RECORD_SIZE)
+
+def _set_record(slot, used, fmt, duration, size):
+    global _payload_slot
+    ustruct.pack_into(RECORD_FORMAT, _index, slot * RECORD_SIZE, used, fmt, duration, size)
+    offset = slot * RECORD_SIZE
+    with open(INDEX_FILE, "r+b") as f:
+        f.seek(offset)
+        f.write(_index[offset:offset + RECORD_SIZE])
+    if slot == _payload_slot:
+        _payload_slot = -1
+
+def check_slot(slot):
+    if not available:
+        raise ValueError("no sd card")
+    if not 0 <= slot < MAX_SLOTS:
+        raise ValueError(f"slot must be 0..{MAX_SLOTS - 1}")
+
+async def store(slot, tmp_path, duration=DEFAULT_DURATION):
+    """Install a validated frame file (header + payload) as the given slot."""
+    check_slot(slot)
+    size = os.stat(tmp_path)[6]
+    with open(tmp_path, "rb") as f:
+        fmt = frame_codec.read_header(f)
+    path = slot_path(slot)
+    # Not while a prefetch has the slot's file open
+    async with _lock:
+        try: os.remove(path)
+        except OSError: pass
+        os.rename(tmp_path, path)
+        _set_record(slot, 1, fmt, max(MIN_DURATION, min(duration, 0xFFFF)), size)
+
+async def remove(slot):
+    check_slot(slot)
+    async with _lock:
+        _set_record(slot, 0, 0, 0, 0)
+        try: os.remove(slot_path(slot))
+        except OSError: pass
+
+def list_slots():
+    slots = []
+    if available:
+        for slot in range(MAX_SLOTS):
+            used, fmt, duration, size = get_record(slot)
+            if used:
+                slots.append({"slot": slot, "format": fmt, "duration": duration, "size": size})
+    return slots
+
+def next_slot(after):
+    """The first used slot after the given one, wrapping around. -1 if none."""
+    if not available:
+        return -1
+    for i in range(1, MAX_SLOTS + 1):
+        slot = (after + i) % MAX_SLOTS
+        if _index[slot * RECORD_SIZE]:
+            return slot
+    return -1
+
+def due():
+    return time.time() >= due_at
+
+def seconds_left():
+    return max(0, due_at - time.time())
+
+async def _load(slot):
+    # Caller holds _lock
+    global _payload, _payload_len, _payload_slot
+    if slot == _payload_slot:
+        return
+    if _payload is None:
+        _payload = bytearray(frame_codec.STORED_MAX)
+    _payload_slot = -1
+    mv = memoryview(_payload)
+    n = 0
+    with open(slot_path(slot), "rb") as f:
+        while n < len(_payload):
+            k = f.readinto(mv[n:n + READ_CHUNK])
+            if not k:
+                break
+            n += k
+            await uasyncio.sleep_ms(0) # Let the web server run between reads
+    _payload_len = n
+    _payload_slot = slot
+
+async def prefetch(slot):
+    async with _lock:
+        try:
+            await _load(slot)
+        except Exception as e:
+            print(f"Playlist Prefetch Error: {e}")
+
+async def show_next(out):
+    """
+    Decode the next slot's frame into out and start prefetching the one
+    after it. Returns the slot shown, or -1 if the playlist is empty.
+    Slots that fail to load or decode are skipped; ValueError if all do.
+    """
+    global current, due_at, showing
+    showing = False
+    slot = current
+    failed = -1
+    while True:
+        slot = next_slot(slot)
+        if slot < 0:
+            return -1
+        if slot == failed:
+            raise ValueError("no readable slot")
+        try:
+            async with _lock:
+                await _load(slot)
+                frame_codec.decode(frame_codec.BufferReader(_payload, _payload_len), out)
+            break
+        except Exception as e:
+            print(f"Playlist Slot {slot} Error: {e}")
+            current = slot # The next call starts after the broken slot
+            if failed < 0:
+                failed = slot
+    current = slot
+    due_at = time.time() + get_record(slot)[2]
+    showing = True
+
+    following = next_slot(slot)
+    if following != slot:
+        uasyncio.create_task(prefetch(following))
+    return slot
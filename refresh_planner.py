@@ -0,0 +1,124 @@
+import time
+import ujson
+
+# --- E-Paper Refresh Planner ---
+# Partial updates are fast but leave ghosting behind, roughly in proportion
+# to how many pixels they flip. Instead of a fixed "full refresh every N
+# partials", keep a running total of the changed area and ask for a full
+# refresh once it (or the time since the last full refresh) gets too large.
+
+# Policy (tunable through /api/display/policy)
+MAX_AREA = 15000         # Cumulative flipped pixels between full refreshes (panel: 37888)
+MAX_UPDATE_AREA = 9000   # A single update flipping more than this is done as a full refresh
+MAX_PARTIALS = 60        # Hard cap on consecutive partial refreshes
+MAX_AGE = 3600           # Seconds between full refreshes
+
+POLICY_KEYS = ("max_area", "max_update_area", "max_partials", "max_age")
+
+CONFIG_FILE = "refresh_policy.json"
+
+# Counters since the last full refresh
+area = 0
+partials = 0
+last_full = 0
+last_reason = "boot"
+
+# Lifetime totals (since boot)
+full_count = 0
+partial_count = 0
+full_ms = 0
+partial_ms = 0
+flipped_total = 0 # Pixels flipped by partial refreshes
+
+def get_policy():
+    return {
+        "max_area": MAX_AREA,
+        "max_update_area": MAX_UPDATE_AREA,
+        "max_partials": MAX_PARTIALS,
+        "max_age": MAX_AGE,
+    }
+
+def save_state():
+    try:
+        with open(CONFIG_FILE, "w") as f:
+            ujson.dump(get_policy(), f)
+    except Exception as e:
+        print(f"Save Refresh Policy Error: {e}")
+
+def load_state():
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            set_policy(ujson.load(f), save=False)
+    except:
+        pass # Use defaults
+
+def set_policy(data, save=True):
+    """Update any of POLICY_KEYS from a dict. Raises ValueError on bad values."""
+    global MAX_AREA, MAX_UPDATE_AREA, MAX_PARTIALS, MAX_AGE
+    values = get_policy()
+    for key in POLICY_KEYS:
+        if key in data:
+            value = int(data[key])
+            if value < 0:
+                raise ValueError(f"{key} must be >= 0")
+            values[key] = value
+    MAX_AREA = values["max_area"]
+    MAX_UPDATE_AREA = values["max_update_area"]
+    MAX_PARTIALS = values["max_partials"]
+    MAX_AGE = values["max_age"]
+    if save:
+        save_state()
+
+def allow_partial(flipped):
+    """Decide whether an update flipping this many pixels may be partial."""
+    global last_reason
+    reason = None
+    if last_full == 0:
+        reason = "first"
+    elif flipped > MAX_UPDATE_AREA:
+        reason = "large update"
+    elif area + flipped > MAX_AREA:
+        reason = "area"
+    elif partials >= MAX_PARTIALS:
+        reason = "count"
+    else:
+        age = time.time() - last_full
+        # A clock step (NTP sync) can make age negative; restart the timer
+        if age < 0 or age >= MAX_AGE:
+            reason = "age"
+    if reason is None:
+        return True
+    last_reason = reason
+    return False
+
+def record(partial, flipped, ms):
+    """Account for a refresh that just finished and blocked for ms."""
+    global area, partials, last_full, full_count, partial_count, full_ms, partial_ms, flipped_total
+    if partial:
+        flipped_total += flipped
+        area += flipped
+        partials += 1
+        partial_count += 1
+        partial_ms += ms
+    else:
+        area = 0
+        partials = 0
+        last_full = time.time()
+        full_count += 1
+        full_ms += ms
+
+def get_stats():
+    return {
+        "area": area,
+        "partials": partials,
+        "since_full": time.time() - last_full if last_full else None,
+        "last_reason": last_reason,
+        "full_count": full_count,
+        "partial_count": partial_count,
+        "full_ms": full_ms,
+        "partial_ms": partial_ms,
+        "flipped_total": flipped_total,
+    }
+
+# Init
+load_state()
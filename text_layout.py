@@ -0,0 +1,99 @@
+import font_zh
+from collections import OrderedDict
+
+# --- Text Layout ---
+# Line breaking for font_zh.draw_text. CJK glyphs are 16px wide and may
+# break anywhere; ASCII (and "?" for missing glyphs) is 8px and breaks at
+# spaces. Results are cached per text, so a message is only laid out when
+# it changes.
+
+ASCII_WIDTH = 8
+GLYPH_WIDTH = 16
+ELLIPSIS = "..."
+
+CACHE_SIZE = 4
+_cache = OrderedDict() # (text, width, max_lines) -> lines, oldest first
+
+def char_width(char):
+    if ord(char) < 128 or not font_zh.has_glyph(char):
+        return ASCII_WIDTH
+    return GLYPH_WIDTH
+
+def measure(text):
+    """Width in pixels of text as drawn by font_zh.draw_text."""
+    w = 0
+    for char in text:
+        w += char_width(char)
+    return w
+
+def _tokens(text):
+    # ASCII words stay together; spaces and other characters stand alone
+    start = -1
+    for i, char in enumerate(text):
+        if char != " " and ord(char) < 128:
+            if start < 0:
+                start = i
+            continue
+        if start >= 0:
+            yield text[start:i]
+            start = -1
+        yield char
+    if start >= 0:
+        yield text[start:]
+
+def wrap(text, width):
+    """Break text into lines no wider than width. Newlines force a break."""
+    lines = []
+    for para in text.split("\n"):
+        line = ""
+        line_w = 0
+        for token in _tokens(para):
+            w = measure(token)
+            if token == " ":
+                # Spaces are dropped at a line break
+                if line and line_w + w <= width:
+                    line += token
+                    line_w += w
+                continue
+            if line and line_w + w > width:
+                lines.append(line.rstrip())
+                line = ""
+                line_w = 0
+            if w > width:
+                # Word longer than a whole line: break it anywhere
+                for char in token:
+                    cw = char_width(char)
+                    if line and line_w + cw > width:
+                        lines.append(line)
+                        line = ""
+                        line_w = 0
+                    line += char
+                    line_w += cw
+                continue
+            line += token
+            line_w += w
+        lines.append(line.rstrip())
+    return lines
+
+def ellipsize(text, width):
+    """Shorten text so that it plus ELLIPSIS fits in width."""
+    limit = width - measure(ELLIPSIS)
+    w = measure(text)
+    while text and w > limit:
+        w -= char_width(text[-1])
+        text = text[:-1]
+    return text.rstrip() + ELLIPSIS
+
+def layout(text, width, max_lines=None):
+    """Cached wrap(), clipped to max_lines with an ellipsis on the last line."""
+    key = (text, width, max_lines)
+    lines = _cache.pop(key, None)
+    if lines is None:
+        lines = wrap(text, width)
+        if max_lines is not None and len(lines) > max_lines:
+            lines = lines[:max_lines]
+            lines[-1] = ellipsize(lines[-1], width)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+    _cache[key] = lines # Most recent last
+    return lines
@@ -0,0 +1,303 @@
+"""
+Rendering benchmark for display_ui.
+
+Runs draw_screen in weather, message and image modes (full and partial), plus
+draw_big_text and font_zh.draw_text on their own, against the simulated panel
+from epd_sim.py. Reports per-iteration time, per-stage time, allocations and
+SPI traffic. Works under CPython and the MicroPython unix port, so numbers
+can be compared across commits before anything reaches a device.
+
+    python tools/bench_display.py --root build -n 2000 --json bench.json
+    micropython tools/bench_display.py --root build -n 2000
+    python tools/bench_display.py --root build --compare bench.json
+
+Allocation figures differ by interpreter: on MicroPython they are bytes
+allocated per iteration (gc.mem_alloc with the collector off), on CPython
+the tracemalloc peak per iteration.
+"""
+import sys
+import os
+import gc
+import time
+import json
+import asyncio
+
+import epd_sim
+
+IS_MICROPYTHON = sys.implementation.name == "micropython"
+
+# display_ui functions timed as separate stages (nested calls are included
+# in their caller's time as well)
+STAGES = (
+    "draw_header", "draw_big_text", "draw_weather", "draw_message",
+    "draw_body", "draw_footer", "draw_status", "send_frame", "dirty_spans",
+    "flipped_pixels",
+)
+
+MESSAGE = "Hello 你好 天气预报 meeting at 15:30"
+IMAGE_FILE = "image.bin"
+
+if hasattr(time, "ticks_us"):
+    def now_us():
+        return time.ticks_us()
+
+    def elapsed_us(start):
+        return time.ticks_diff(time.ticks_us(), start)
+else:
+    def now_us():
+        return time.perf_counter_ns() // 1000
+
+    def elapsed_us(start):
+        return now_us() - start
+
+class StageTimer:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = {}
+        self.calls = {}
+
+    def add(self, name, us):
+        self.totals[name] = self.totals.get(name, 0) + us
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def wrap(self, module, name):
+        fn = getattr(module, name, None)
+        if fn is None:
+            return
+        timer = self
+
+        def timed(*args, **kwargs):
+            start = now_us()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.add(name, elapsed_us(start))
+
+        setattr(module, name, timed)
+
+    def per_iteration(self, n):
+        return {name: round(total / n, 1) for name, total in self.totals.items()}
+
+def parse_args(argv):
+    opts = {"root": None, "n": 500, "json": None, "compare": None, "threshold": 10.0, "only": None}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+        key = arg.lstrip("-")
+        if key not in opts or i + 1 >= len(argv):
+            print(f"Unknown or incomplete option: {arg}")
+            sys.exit(2)
+        value = argv[i + 1]
+        if key == "n":
+            value = int(value)
+        elif key == "threshold":
+            value = float(value)
+        opts[key] = value
+        i += 2
+    if opts["root"] is None:
+        opts["root"] = epd_sim.default_root()
+    # setup() changes directory, so resolve file arguments now
+    for key in ("root", "json", "compare"):
+        if opts[key]:
+            opts[key] = epd_sim._abspath(opts[key])
+    return opts
+
+def git_commit():
+    if IS_MICROPYTHON:
+        return "unknown"
+    import subprocess
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=epd_sim.REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def work_dir():
+    if IS_MICROPYTHON:
+        return "/tmp"
+    import tempfile
+    return tempfile.mkdtemp(prefix="bench_display_")
+
+def time_str(i):
+    minute = i % (24 * 60)
+    return "{:02d}:{:02d}".format(minute // 60, minute % 60)
+
+def setup(root):
+    """Import the firmware against the simulator with fixed, repeatable data."""
+    epd_sim.install(root)
+
+    import display_ui
+    import font_zh
+    import weather_api
+    import wifi_manager
+
+    # Keep font_data.bin in the build dir but run (and write image.bin)
+    # somewhere that is never uploaded to the device
+    font_zh.DATA_FILE = root + "/font_data.bin"
+    os.chdir(work_dir())
+    with open(IMAGE_FILE, "wb") as f:
+        f.write(bytes((i * 37) & 0xFF for i in range(display_ui.FRAME_SIZE)))
+
+    weather_api.cache["temp"] = 21.5
+    weather_api.cache["desc"] = "多云"
+    weather_api.cache["forecast"] = [("01-01", 23.1, 12.4), ("01-02", 19.8, 10.0), ("01-03", 25.0, 14.2)]
+    weather_api.cache["last_update"] = 1
+    wifi_manager.ip_address = "192.168.0.110"
+
+    # draw_screen logs every frame; silence it for thousands of iterations
+    display_ui.print = lambda *args, **kwargs: None
+
+    display_ui.init()
+    return display_ui, font_zh
+
+async def measure_alloc(fn, n):
+    """Average allocation per call (see module docstring for the meaning)."""
+    if IS_MICROPYTHON:
+        gc.collect()
+        gc.disable()
+        total = 0
+        for i in range(n):
+            before = gc.mem_alloc()
+            await fn(i)
+            total += gc.mem_alloc() - before
+        gc.enable()
+        gc.collect()
+        return total // n
+
+    import tracemalloc
+    tracemalloc.start()
+    total = 0
+    for i in range(n):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await fn(i)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total // n
+
+async def run_scenario(fn, n, bus, timer):
+    """await fn(i) renders iteration i. Returns the result dict for one scenario."""
+    await fn(0)  # Warm up caches (glyphs, big digits) before measuring
+    bus.reset_stats()
+    timer.reset()
+    samples = []
+    for i in range(1, n + 1):
+        start = now_us()
+        await fn(i)
+        samples.append(elapsed_us(start))
+    spi = bus.stats()
+    stages = timer.per_iteration(n)
+
+    alloc = await measure_alloc(fn, min(n, 50))
+    samples.sort()
+    return {
+        "iterations": n,
+        "mean_us": round(sum(samples) / n, 1),
+        "p50_us": samples[n // 2],
+        "min_us": samples[0],
+        "alloc_bytes": alloc,
+        "spi_bytes": spi["spi_bytes"] // n,
+        "spi_transactions": spi["spi_transactions"] // n,
+        "refresh_ms": spi["refresh_ms"] // n,
+        "stages_us": stages,
+    }
+
+def build_scenarios(display_ui, font_zh, epd):
+    # All scenarios are coroutines run inside one event loop, so loop
+    # setup and teardown is not part of any sample
+    def screen(message, partial):
+        async def fn(i):
+            await display_ui.draw_screen(epd, time_str(i), "2025-01-01", message, partial=partial)
+        return fn
+
+    async def big_text(i):
+        display_ui.draw_big_text(display_ui.fb, time_str(i), 19, 40, scale=display_ui.CLOCK_SCALE)
+
+    async def font_text(i):
+        font_zh.draw_text(display_ui.fb, "天气预报 北京 21.5 C", 0, 100)
+
+    return (
+        ("weather_full", screen("", False)),
+        ("weather_partial", screen("", True)),
+        ("message_full", screen(MESSAGE, False)),
+        ("message_partial", screen(MESSAGE, True)),
+        ("image", screen("__IMAGE__", False)),
+        ("draw_big_text", big_text),
+        ("font_zh.draw_text", font_text),
+    )
+
+def compare(results, baseline_path, threshold):
+    """Print changes against a previous run. Returns True if something regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print()
+    print(f"Compared with {baseline_path} ({baseline['meta'].get('commit')}), threshold {threshold}%")
+    regressed = False
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        for key in ("mean_us", "alloc_bytes", "spi_bytes"):
+            before = old.get(key)
+            after = result[key]
+            if not before:
+                continue
+            change = (after - before) * 100 / before
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressed = True
+            print(f"  {name:<20} {key:<12} {before:>10} -> {after:>10} ({change:+.1f}%){flag}")
+    return regressed
+
+def main():
+    opts = parse_args(sys.argv[1:])
+    n = opts["n"]
+    display_ui, font_zh = setup(opts["root"])
+    epd, bus = epd_sim.make_epd()
+
+    timer = StageTimer()
+    for name in STAGES:
+        timer.wrap(display_ui, name)
+
+    results = {}
+
+    async def run_all():
+        for name, fn in build_scenarios(display_ui, font_zh, epd):
+            if opts["only"] and opts["only"] not in name:
+                continue
+            results[name] = await run_scenario(fn, n, bus, timer)
+
+    asyncio.run(run_all())
+
+    print(f"{'scenario':<20} {'mean us':>10} {'p50 us':>10} {'alloc B':>10} {'spi B':>8} {'refresh ms':>11}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['mean_us']:>10} {r['p50_us']:>10} {r['alloc_bytes']:>10} {r['spi_bytes']:>8} {r['refresh_ms']:>11}")
+        for stage, us in sorted(r["stages_us"].items()):
+            print(f"    {stage:<16} {us:>10}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "implementation": sys.implementation.name,
+            "version": sys.version.split()[0],
+            "iterations": n,
+        },
+        "results": results,
+    }
+    if opts["json"]:
+        with open(opts["json"], "w") as f:
+            json.dump(report, f)
+        print(f"Saved {opts['json']}")
+
+    if opts["compare"] and compare(results, opts["compare"], opts["threshold"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
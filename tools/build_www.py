@@ -0,0 +1,83 @@
+"""
+Post-process the web UI in a build directory for serving from the device.
+
+For every file under www/ this writes a gzip variant (file.gz, only kept
+when it saves at least MIN_SAVING) and a content hash, and records them
+with the size and MIME type in www/manifest.json. web_server loads it at
+boot and routes static requests with it:
+
+    {"index.html": {"size": 512, "type": "text/html", "etag": "3f2a...", "gz": 301}, ...}
+
+"gz" is the size of the .gz file, or 0 if there is none.
+
+    python tools/build_www.py build/www
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import mimetypes
+
+MANIFEST = "manifest.json"
+MIN_SAVING = 0.1   # Skip .gz files that are less than 10% smaller
+HASH_CHARS = 16
+
+# Types mimetypes gets wrong or does not know on every platform
+TYPES = {
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".css": "text/css",
+    ".html": "text/html",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+    ".woff2": "font/woff2",
+    ".json": "application/json",
+    ".webmanifest": "application/manifest+json",
+}
+
+def mime_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    return TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+def iter_files(www_dir):
+    for root, dirs, files in os.walk(www_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, www_dir).replace(os.sep, "/")
+            if rel == MANIFEST or rel.endswith(".gz"):
+                continue
+            yield rel, path
+
+def prepare_www(www_dir):
+    """Write .gz variants and manifest.json into www_dir. Returns the manifest."""
+    manifest = {}
+    total = 0
+    total_gz = 0
+    for rel, path in iter_files(www_dir):
+        with open(path, "rb") as f:
+            data = f.read()
+        # mtime=0 keeps the .gz output identical between builds
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        gz_size = 0
+        if len(packed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + ".gz", "wb") as f:
+                f.write(packed)
+            gz_size = len(packed)
+        manifest[rel] = {
+            "size": len(data),
+            "type": mime_type(rel),
+            "etag": hashlib.sha256(data).hexdigest()[:HASH_CHARS],
+            "gz": gz_size,
+        }
+        total += len(data)
+        total_gz += gz_size or len(data)
+
+    with open(os.path.join(www_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, separators=(",", ":"), sort_keys=True)
+    print(f"  www: {len(manifest)} files, {total / 1024:.1f} KB, {total_gz / 1024:.1f} KB sent with gzip")
+    return manifest
+
+if __name__ == "__main__":
+    prepare_www(sys.argv[1] if len(sys.argv) > 1 else os.path.join("build", "www"))
@@ -0,0 +1,305 @@
+"""
+Convert images to 128x296 panel frames and optionally upload them.
+
+Images are scaled with NumPy (area averaging, then bilinear), dithered
+(Floyd-Steinberg or 8x8 Bayer) and packed MONO_HLSB, 1 = white, the layout
+il3820 and display_ui use. Frames are written in the frame_codec storage
+format (raw, rle or deflate). Directories are converted in parallel, one
+process per core.
+
+    python tools/convert_image.py photo.jpg --out frames --png
+    python tools/convert_image.py photo.jpg --format rle --upload 192.168.0.110
+    python tools/convert_image.py album/ --out frames --dither bayer
+    python tools/convert_image.py album/ --upload 192.168.0.110 --playlist --duration 600
+"""
+import os
+import sys
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Appended, not prepended: the firmware's hmac.py must not shadow the stdlib.
+# tools/sim provides the ustruct/ubinascii modules frame_codec imports.
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path += [os.path.dirname(TOOLS_DIR), os.path.join(TOOLS_DIR, "sim")]
+import frame_codec  # noqa: E402
+
+WIDTH = 128
+HEIGHT = 296
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff")
+
+BAYER_8 = np.array([
+    [0, 32, 8, 40, 2, 34, 10, 42],
+    [48, 16, 56, 24, 50, 18, 58, 26],
+    [12, 44, 4, 36, 14, 46, 6, 38],
+    [60, 28, 52, 20, 62, 30, 54, 22],
+    [3, 35, 11, 43, 1, 33, 9, 41],
+    [51, 19, 59, 27, 49, 17, 57, 25],
+    [15, 47, 7, 39, 13, 45, 5, 37],
+    [63, 31, 55, 23, 61, 29, 53, 21],
+], dtype=np.float32)
+
+# --- Scaling ---
+def load_gray(path):
+    """Image as a float32 array of luminance, 0..255."""
+    with Image.open(path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white, like the panel background
+            im = im.convert("RGBA")
+            background = Image.new("RGBA", im.size, (255, 255, 255, 255))
+            im = Image.alpha_composite(background, im)
+        return np.asarray(im.convert("L"), dtype=np.float32)
+
+def crop_to_aspect(img, width, height):
+    src_h, src_w = img.shape
+    if src_w * height > width * src_h:
+        new_w = max(1, src_h * width // height)
+        x = (src_w - new_w) // 2
+        return img[:, x:x + new_w]
+    new_h = max(1, src_w * height // width)
+    y = (src_h - new_h) // 2
+    return img[y:y + new_h, :]
+
+def resize(img, width, height):
+    """Area-average down by the largest whole factor, then bilinear to size."""
+    src_h, src_w = img.shape
+    factor = min(src_h // height, src_w // width)
+    if factor >= 2:
+        h = src_h // factor * factor
+        w = src_w // factor * factor
+        img = img[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+        src_h, src_w = img.shape
+
+    ys = (np.arange(height, dtype=np.float32) + 0.5) * src_h / height - 0.5
+    xs = (np.arange(width, dtype=np.float32) + 0.5) * src_w / width - 0.5
+    y0 = np.clip(np.floor(ys).astype(np.intp), 0, src_h - 1)
+    x0 = np.clip(np.floor(xs).astype(np.intp), 0, src_w - 1)
+    y1 = np.minimum(y0 + 1, src_h - 1)
+    x1 = np.minimum(x0 + 1, src_w - 1)
+    wy = np.clip(ys - y0, 0, 1)[:, None]
+    wx = np.clip(xs - x0, 0, 1)[None, :]
+
+    top = img[y0][:, x0] * (1 - wx) + img[y0][:, x1] * wx
+    bottom = img[y1][:, x0] * (1 - wx) + img[y1][:, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+def fit(img, mode):
+    """Scale to the panel: fill (crop), fit (letterbox on white) or stretch."""
+    if mode == "fill":
+        return resize(crop_to_aspect(img, WIDTH, HEIGHT), WIDTH, HEIGHT)
+    if mode == "stretch":
+        return resize(img, WIDTH, HEIGHT)
+    src_h, src_w = img.shape
+    scale = min(WIDTH / src_w, HEIGHT / src_h)
+    w = max(1, min(WIDTH, round(src_w * scale)))
+    h = max(1, min(HEIGHT, round(src_h * scale)))
+    out = np.full((HEIGHT, WIDTH), 255, dtype=np.float32)
+    y = (HEIGHT - h) // 2
+    x = (WIDTH - w) // 2
+    out[y:y + h, x:x + w] = resize(img, w, h)
+    return out
+
+# --- Dithering (True = white) ---
+def dither_threshold(img, threshold=128):
+    return img >= threshold
+
+def dither_bayer(img):
+    h, w = img.shape
+    thresholds = (BAYER_8 + 0.5) * (255 / 64)
+    return img >= np.tile(thresholds, (h // 8 + 1, w // 8 + 1))[:h, :w]
+
+def dither_floyd(img):
+    """Floyd-Steinberg. Only the 7/16 error to the right neighbour is
+    sequential; what a row pushes down to the next is added for the whole
+    row at once."""
+    h, w = img.shape
+    work = img.astype(np.float32)
+    out = np.empty((h, w), dtype=bool)
+    for y in range(h):
+        row = work[y].tolist()  # Plain floats are much faster to loop over
+        bits = [False] * w
+        errors = [0.0] * w
+        carry = 0.0
+        for x in range(w):
+            value = row[x] + carry
+            white = value >= 128
+            bits[x] = white
+            err = value - 255.0 if white else value
+            errors[x] = err
+            carry = err * (7 / 16)
+        out[y] = bits
+        if y + 1 < h:
+            spread = np.array(errors, dtype=np.float32)
+            below = work[y + 1]
+            below[:-1] += spread[1:] * (3 / 16)
+            below += spread * (5 / 16)
+            below[1:] += spread[:-1] * (1 / 16)
+    return out
+
+DITHERS = {"floyd": dither_floyd, "bayer": dither_bayer, "none": dither_threshold}
+
+def pack(bits):
+    """bool HEIGHTxWIDTH (True = white) -> MONO_HLSB frame bytes."""
+    return np.packbits(bits.astype(np.uint8), axis=1).tobytes()
+
+# --- Storage formats (see frame_codec.py) ---
+def encode_rle(data):
+    """PackBits: runs of 3+ equal bytes, literals of up to 128 bytes. Shorter
+    repeats stay in the literal, so output grows by at most 1/128."""
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        j = i
+        while j < n and j - i < 128 and data[j] == data[i]:
+            j += 1
+        if j - i >= 3:
+            out += bytes((257 - (j - i), data[i]))
+            i = j
+            continue
+        j = i + 1
+        while j < n and j - i < 128 and not (j + 2 < n and data[j] == data[j + 1] == data[j + 2]):
+            j += 1
+        out.append(j - i - 1)
+        out += data[i:j]
+        i = j
+    return bytes(out)
+
+def encode(frame, fmt):
+    """Payload for the given format name."""
+    if fmt == "rle":
+        return encode_rle(frame)
+    if fmt == "deflate":
+        return zlib.compress(frame, 9)
+    return frame
+
+def best_format(frame):
+    """Smallest of rle and deflate (raw if neither helps)."""
+    sizes = {fmt: len(encode(frame, fmt)) for fmt in ("raw", "rle", "deflate")}
+    return min(sizes, key=sizes.get)
+
+# --- Conversion ---
+def convert(path, fit_mode="fill", dither="floyd", rotate=0, fmt="rle"):
+    """Returns (path, frame bytes, format name, payload)."""
+    img = load_gray(path)
+    if rotate:
+        img = np.rot90(img, k=rotate // 90)
+    frame = pack(DITHERS[dither](fit(img, fit_mode)))
+    if fmt == "auto":
+        fmt = best_format(frame)
+    payload = encode(frame, fmt)
+    if len(payload) >= len(frame):
+        # Compression did not help: raw is smaller and always accepted
+        fmt, payload = "raw", frame
+    return path, frame, fmt, payload
+
+def _convert_job(args):
+    path, options = args
+    try:
+        return convert(path, **options)
+    except Exception as e:
+        return path, None, None, str(e)
+
+def collect(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(IMAGE_EXTS):
+                    paths.append(os.path.join(item, name))
+        else:
+            paths.append(item)
+    return paths
+
+def convert_all(paths, options, jobs=None):
+    """Yields convert() results in input order, in parallel when worthwhile."""
+    work = [(path, options) for path in paths]
+    if len(work) < 2 or jobs == 1:
+        yield from map(_convert_job, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_convert_job, work, chunksize=4)
+
+# --- Upload ---
+def upload(ip, token, payload, fmt, slot=None, duration=None):
+    import requests
+
+    headers = {"X-Token": token, "Content-Type": "application/octet-stream"}
+    if slot is None:
+        url = f"http://{ip}/api/display/image?format={fmt}"
+    else:
+        url = f"http://{ip}/api/playlist/{slot}?format={fmt}"
+        if duration:
+            url += f"&duration={duration}"
+    r = requests.post(url, data=payload, headers=headers)
+    if r.status_code != 200:
+        raise RuntimeError(f"{r.status_code} - {r.text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert images to e-paper frames")
+    parser.add_argument("inputs", nargs="+", help="image files or directories")
+    parser.add_argument("--out", help="directory for .epf frames (frame_codec format)")
+    parser.add_argument("--png", action="store_true", help="also write a preview .png next to each frame")
+    parser.add_argument("--fit", choices=("fill", "fit", "stretch"), default="fill")
+    parser.add_argument("--dither", choices=sorted(DITHERS), default="floyd")
+    parser.add_argument("--rotate", type=int, choices=(0, 90, 180, 270), default=0)
+    parser.add_argument("--format", choices=("raw", "rle", "deflate", "auto"), default="auto")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--upload", metavar="IP", help="send to the device")
+    parser.add_argument("--playlist", action="store_true", help="upload into playlist slots instead of the image")
+    parser.add_argument("--slot", type=int, default=0, help="first playlist slot")
+    parser.add_argument("--duration", type=int, help="seconds per playlist slot")
+    args = parser.parse_args()
+
+    paths = collect(args.inputs)
+    if not paths:
+        print("No images found.")
+        return 1
+    if args.upload and not args.playlist and len(paths) > 1:
+        print("Only one image can be shown; use --playlist to upload several.")
+        return 1
+
+    token = None
+    if args.upload:
+        from deploy_ota import get_token
+        token = get_token(args.upload)
+        if not token:
+            return 1
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    options = {"fit_mode": args.fit, "dither": args.dither, "rotate": args.rotate, "fmt": args.format}
+    failed = 0
+    slot = args.slot
+    for path, frame, fmt, payload in convert_all(paths, options, args.jobs):
+        if frame is None:
+            print(f"{path}: {payload}")
+            failed += 1
+            continue
+        print(f"{path}: {fmt} {len(payload)} bytes ({len(payload) * 100 // len(frame)}%)")
+
+        if args.out:
+            base = os.path.join(args.out, os.path.splitext(os.path.basename(path))[0])
+            with open(base + ".epf", "wb") as f:
+                f.write(frame_codec.header(frame_codec.FORMATS[fmt]) + payload)
+            if args.png:
+                import epd_sim
+                epd_sim.save_png(frame, base + ".png")
+
+        if args.upload:
+            try:
+                upload(args.upload, token, payload, fmt,
+                       slot if args.playlist else None, args.duration)
+            except Exception as e:
+                print(f"  Upload failed: {e}")
+                failed += 1
+            slot += 1
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import requests
 import sign # Our sign.py module
+import build_www
 import sys
 import os
 import subprocess
@@ -38,6 +39,7 @@ def build_project():
     # 4. Copy WWW
     if os.path.exists("www"):
         shutil.copytree("www", os.path.join(BUILD_DIR, "www"))
+        build_www.prepare_www(os.path.join(BUILD_DIR, "www"))
         
     # 5. Compile Fonts
     print("  Compiling Fonts...")
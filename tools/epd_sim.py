@@ -0,0 +1,315 @@
+"""
+Host-side IL3820 simulator.
+
+make_epd() returns the real il3820.EPD driver wired to a fake SPI bus and
+pins. The bus decodes the controller command stream, so everything the
+firmware does (RAM windows, address pointer, RAM writes, update sequences)
+is recorded and applied to a model of the controller RAM. Refresh times are
+modelled, not waited for.
+
+    python tools/epd_sim.py --root build --out frame.png
+    python tools/epd_sim.py --root build --message "Hello 你好" --partial
+"""
+import os
+import sys
+import struct
+import time
+
+# Plain string paths: the MicroPython unix port has no os.path
+def _abspath(path):
+    return path if path.startswith("/") else os.getcwd() + "/" + path
+
+def _dirname(path):
+    return path.rsplit("/", 1)[0] if "/" in path else "."
+
+TOOLS_DIR = _dirname(_abspath(__file__))
+REPO_DIR = _dirname(TOOLS_DIR)
+SHIM_DIR = TOOLS_DIR + "/sim"
+
+WIDTH = 128
+HEIGHT = 296
+ROW_BYTES = WIDTH // 8
+FRAME_SIZE = ROW_BYTES * HEIGHT
+
+SPI_BAUDRATE = 2000000  # Same as main.py
+
+# Approximate panel refresh times (ms) by Display Update Control 2 value
+REFRESH_MS = {
+    0xF7: 2000,  # Full refresh (OTP full LUT)
+    0xC7: 300,   # Differential partial refresh (LUT_PARTIAL, both RAM banks)
+    0xFF: 450,   # OTP fast/partial mode
+}
+REFRESH_NAMES = {0xF7: "full", 0xC7: "diff", 0xFF: "otp_partial"}
+
+def install(root=None):
+    """Make the firmware modules importable on the host.
+
+    Adds the shim modules (framebuf, uasyncio, machine, ...) and the firmware
+    tree to sys.path. The shims are skipped on the MicroPython unix port,
+    which has the real modules. root is the directory holding font_zh.py and
+    font_data.bin (normally the build/ output of flash.py); it becomes the
+    working directory because font_zh opens its data file relatively.
+    """
+    if sys.implementation.name == "micropython":
+        _install_micropython_shims()
+    elif SHIM_DIR not in sys.path:
+        sys.path.insert(0, SHIM_DIR)
+    for path in (REPO_DIR, root):
+        if path and _abspath(path) not in sys.path:
+            sys.path.insert(1, _abspath(path))
+    if root:
+        os.chdir(root)
+
+    import gc
+    if not hasattr(gc, "mem_free"):
+        gc.mem_free = lambda: 0
+    if not hasattr(time, "sleep_ms"):
+        time.sleep_ms = lambda ms: None
+    if not hasattr(time, "ticks_ms"):
+        time.ticks_ms = lambda: int(time.monotonic() * 1000)
+        time.ticks_diff = lambda a, b: a - b
+
+# Hardware modules the unix port lacks (or has without the attribute the
+# firmware needs). Module name -> attribute that must exist.
+MICROPYTHON_SHIMS = {"machine": "Pin", "network": "WLAN", "neopixel": "NeoPixel"}
+
+def _install_micropython_shims():
+    # Built-in modules win over files on sys.path, so register the shims
+    # directly in sys.modules as plain namespaces
+    for name, attr in MICROPYTHON_SHIMS.items():
+        try:
+            if hasattr(__import__(name), attr):
+                continue
+        except ImportError:
+            pass
+        namespace = {}
+        with open(SHIM_DIR + "/" + name + ".py") as f:
+            exec(f.read(), namespace)
+        sys.modules[name] = type(name, (), namespace)
+
+class SimPin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, value=0):
+        self._value = value
+
+    def init(self, mode=None, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+class SimBus:
+    """Fake SPI bus that decodes IL3820 (SSD1608) commands."""
+
+    def __init__(self):
+        self.cs = SimPin(1)
+        self.dc = SimPin(0)
+        self.busy = SimPin(0)  # Refreshes complete instantly; time is modelled
+        self.ram = {0x24: bytearray(b"\xff" * FRAME_SIZE), 0x26: bytearray(b"\xff" * FRAME_SIZE)}
+        self.frame = bytearray(b"\xff" * FRAME_SIZE)  # What the panel shows
+        self.reset_stats()
+
+        self._cmd = None
+        self._args = bytearray()
+        self._x_window = (0, ROW_BYTES - 1)
+        self._y_window = (0, HEIGHT - 1)
+        self._x = 0
+        self._y = 0
+        self._sequence = 0xF7
+        self._lut_loaded = False
+
+    def reset_stats(self):
+        self.log = []          # (command, arg bytes) for every command
+        self.windows = []      # (x_start, x_end, y_start, y_end) per RAM write
+        self.refreshes = []    # (mode name, modelled ms, changed pixels)
+        self.bytes_sent = 0
+        self.transactions = 0
+        self.ram_bytes = 0
+        self.refresh_ms = 0
+        self.stale_old_pixels = 0  # RAM 0x26 != panel at a differential update
+
+    # --- SPI ---
+    def write(self, data):
+        if self.cs.value():
+            raise RuntimeError("SPI write with CS high")
+        self.bytes_sent += len(data)
+        self.transactions += 1
+        if self.dc.value() == 0:
+            for b in bytes(data):
+                self._begin(b)
+        else:
+            self._feed(bytes(data))
+
+    # --- Command decoding ---
+    def _begin(self, cmd):
+        self._finish()
+        self._cmd = cmd
+        self._args = bytearray()
+        if cmd in (0x24, 0x26):
+            self.windows.append(self._x_window + self._y_window)
+        elif cmd == 0x20:
+            self._activate()
+
+    def _finish(self):
+        if self._cmd is None:
+            return
+        cmd = self._cmd
+        args = bytes(self._args) if cmd not in (0x24, 0x26) else b""
+        self.log.append((cmd, args))
+        if cmd == 0x44 and len(args) >= 2:
+            self._x_window = (args[0], args[1])
+        elif cmd == 0x45 and len(args) >= 4:
+            self._y_window = (args[0] | (args[1] << 8), args[2] | (args[3] << 8))
+        elif cmd == 0x4E and len(args) >= 1:
+            self._x = args[0]
+        elif cmd == 0x4F and len(args) >= 2:
+            self._y = args[0] | (args[1] << 8)
+        elif cmd == 0x22 and args:
+            self._sequence = args[0]
+        elif cmd == 0x32:
+            self._lut_loaded = True
+        self._cmd = None
+
+    def _feed(self, data):
+        cmd = self._cmd
+        if cmd not in (0x24, 0x26):
+            self._args.extend(data)
+            return
+        # Data entry mode 0x03: X increments, wraps to the next Y line
+        ram = self.ram[cmd]
+        x_start, x_end = self._x_window
+        y_start, y_end = self._y_window
+        x, y = self._x, self._y
+        for b in data:
+            if 0 <= y < HEIGHT and 0 <= x < ROW_BYTES:
+                ram[y * ROW_BYTES + x] = b
+            x += 1
+            if x > x_end:
+                x = x_start
+                y += 1
+                if y > y_end:
+                    y = y_start
+        self._x, self._y = x, y
+        self.ram_bytes += len(data)
+
+    def _activate(self):
+        seq = self._sequence
+        new = self.ram[0x24]
+        changed = count_changed_pixels(self.frame, new)
+        if seq == 0xC7:
+            self.stale_old_pixels += count_changed_pixels(self.frame, self.ram[0x26])
+        self.frame[:] = new
+        ms = REFRESH_MS.get(seq, 2000)
+        self.refresh_ms += ms
+        self.refreshes.append((REFRESH_NAMES.get(seq, hex(seq)), ms, changed))
+
+    # --- Reporting ---
+    def spi_ms(self, baudrate=SPI_BAUDRATE):
+        return self.bytes_sent * 8 * 1000 / baudrate
+
+    def stats(self):
+        return {
+            "spi_bytes": self.bytes_sent,
+            "spi_transactions": self.transactions,
+            "spi_ms": round(self.spi_ms(), 2),
+            "ram_bytes": self.ram_bytes,
+            "commands": len(self.log),
+            "windows": list(self.windows),
+            "refreshes": list(self.refreshes),
+            "refresh_ms": self.refresh_ms,
+            "stale_old_pixels": self.stale_old_pixels,
+        }
+
+def count_changed_pixels(old, new):
+    return sum(bin(a ^ b).count("1") for a, b in zip(old, new) if a != b)
+
+def default_root():
+    build = REPO_DIR + "/build"
+    try:
+        os.stat(build + "/font_zh.py")
+        return build
+    except OSError:
+        return REPO_DIR
+
+def make_epd():
+    """Return (epd, bus): a real il3820.EPD driving a SimBus. Call install() first."""
+    import il3820
+
+    bus = SimBus()
+    epd = il3820.EPD(bus, bus.cs, bus.dc, bus.busy, rst=None)
+    return epd, bus
+
+# --- Output ---
+def frame_to_array(frame):
+    """296x128 uint8 NumPy array, 0=black 255=white."""
+    import numpy as np
+
+    bits = np.unpackbits(np.frombuffer(bytes(frame), dtype=np.uint8))
+    return (bits.reshape(HEIGHT, WIDTH) * 255).astype(np.uint8)
+
+def frame_to_png(frame):
+    """Encode a MONO_HLSB frame as a 1-bit grayscale PNG (no Pillow needed)."""
+    import zlib
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + bytes(frame[y * ROW_BYTES:(y + 1) * ROW_BYTES]) for y in range(HEIGHT))
+    ihdr = struct.pack(">IIBBBBB", WIDTH, HEIGHT, 1, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(raw, 9))
+        + chunk(b"IEND", b"")
+    )
+
+def save_png(frame, path):
+    with open(path, "wb") as f:
+        f.write(frame_to_png(frame))
+
+def main():
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Render display_ui.draw_screen on the host")
+    parser.add_argument("--root", default=default_root(), help="directory with font_zh.py and font_data.bin")
+    parser.add_argument("--time", default="12:34")
+    parser.add_argument("--date", default="2025-01-01")
+    parser.add_argument("--message", default="")
+    parser.add_argument("--partial", action="store_true", help="render twice, second time as a partial update")
+    parser.add_argument("--out", default="frame.png")
+    args = parser.parse_args()
+
+    out = _abspath(args.out)
+    install(args.root)
+    import display_ui
+
+    epd, bus = make_epd()
+    display_ui.init()
+
+    async def run():
+        await epd.init_async()
+        await display_ui.draw_screen(epd, args.time, args.date, args.message)
+        if args.partial:
+            bus.reset_stats()
+            h, m = args.time.split(":")
+            next_time = "{}:{:02d}".format(h, (int(m) + 1) % 60)
+            await display_ui.draw_screen(epd, next_time, args.date, args.message, partial=True)
+
+    asyncio.run(run())
+    save_png(bus.frame, out)
+    for key, value in bus.stats().items():
+        print(f"{key}: {value}")
+    print(f"Saved {out}")
+
+if __name__ == "__main__":
+    main()
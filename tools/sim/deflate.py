@@ -0,0 +1,42 @@
+# CPython stand-in for MicroPython's deflate module (decompression only).
+import zlib as _zlib
+
+RAW = 1
+ZLIB = 2
+GZIP = 3
+AUTO = 0
+
+_WBITS = {RAW: -15, ZLIB: 15, GZIP: 31, AUTO: 47}
+
+class DeflateIO:
+    def __init__(self, stream, format=AUTO, wbits=0, close=False):
+        self._stream = stream
+        self._inflater = _zlib.decompressobj(_WBITS[format])
+        self._pending = b""
+
+    def read(self, n=-1):
+        out = bytearray()
+        while n < 0 or len(out) < n:
+            if not self._pending:
+                if self._inflater.eof:
+                    break
+                data = self._stream.read(256)
+                if not data:
+                    self._pending = self._inflater.flush()
+                    if not self._pending:
+                        break
+                else:
+                    self._pending = self._inflater.decompress(data)
+                continue
+            k = len(self._pending) if n < 0 else min(n - len(out), len(self._pending))
+            out += self._pending[:k]
+            self._pending = self._pending[k:]
+        return bytes(out)
+
+    def readinto(self, buf):
+        data = self.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
@@ -0,0 +1,117 @@
+# CPython stand-in for MicroPython's framebuf module (MONO_HLSB only).
+# Used by tools/epd_sim.py so display_ui can render on a host machine.
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+_font_cache = {}
+
+def _glyph_rows(char):
+    """8 row bitmasks (MSB = left column) approximating the 8x8 ROM font."""
+    rows = _font_cache.get(char)
+    if rows is not None:
+        return rows
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+        try:
+            font = ImageFont.load_default(size=8)
+        except TypeError:
+            font = ImageFont.load_default()
+        image = Image.new("1", (8, 8), 0)
+        ImageDraw.Draw(image).text((0, -1), char, font=font, fill=1)
+        data = image.tobytes()
+        rows = tuple(data[:8])
+    except ImportError:
+        # No Pillow: draw a box so text placement is still visible
+        rows = (0, 0x7E, 0x42, 0x42, 0x42, 0x42, 0x7E, 0) if char != " " else (0,) * 8
+    _font_cache[char] = rows
+    return rows
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format != MONO_HLSB:
+            raise ValueError("only MONO_HLSB is supported by the host shim")
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.stride = ((stride or width) + 7) // 8
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i = y * self.stride + (x >> 3)
+        bit = 0x80 >> (x & 7)
+        if c is None:
+            return 1 if self.buffer[i] & bit else 0
+        if c & 1:
+            self.buffer[i] |= bit
+        else:
+            self.buffer[i] &= ~bit & 0xFF
+
+    def fill(self, c):
+        value = 0xFF if c & 1 else 0x00
+        for i in range(self.stride * self.height):
+            self.buffer[i] = value
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def text(self, s, x, y, c=1):
+        for char in s:
+            for row, bits in enumerate(_glyph_rows(char)):
+                for col in range(8):
+                    if bits & (0x80 >> col):
+                        self.pixel(x + col, y + row, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                c = fbuf.pixel(xx, yy)
+                if c == key:
+                    continue
+                if palette is not None:
+                    c = palette.pixel(c, 0)
+                self.pixel(x + xx, y + yy, c)
@@ -0,0 +1,31 @@
+# Inert stand-in for MicroPython's machine module. Only what the firmware
+# modules touch at import time; real EPD traffic goes through tools/epd_sim.py.
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id=None, mode=None, value=0):
+        self._value = value
+
+    def init(self, mode=None, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+class SPI:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def write(self, data):
+        pass
+
+def reset():
+    raise SystemExit("machine.reset()")
@@ -0,0 +1,15 @@
+# Inert stand-in for MicroPython's neopixel module.
+
+class NeoPixel:
+    def __init__(self, pin, n):
+        self.n = n
+        self._pixels = [(0, 0, 0)] * n
+
+    def __setitem__(self, i, color):
+        self._pixels[i] = color
+
+    def __getitem__(self, i):
+        return self._pixels[i]
+
+    def write(self):
+        pass
@@ -0,0 +1,23 @@
+# Inert stand-in for MicroPython's network module.
+STA_IF = 0
+AP_IF = 1
+AUTH_OPEN = 0
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+
+    def active(self, state=None):
+        return False
+
+    def isconnected(self):
+        return False
+
+    def ifconfig(self):
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def config(self, *args, **kwargs):
+        pass
+
+    def scan(self):
+        return []
@@ -0,0 +1,6 @@
+# CPython stand-in for MicroPython's uasyncio (asyncio plus sleep_ms).
+from asyncio import *  # noqa: F401,F403
+import asyncio as _asyncio
+
+def sleep_ms(ms):
+    return _asyncio.sleep(ms / 1000)
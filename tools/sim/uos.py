@@ -0,0 +1,2 @@
+# CPython stand-in for MicroPython's uos.
+from os import *  # noqa: F401,F403
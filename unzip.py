@@ -1,7 +1,11 @@
 import ustruct
 import uos
 
+CHUNK_SIZE = 1024
+
 def extract(zip_path, dest_dir):
+    buf = bytearray(CHUNK_SIZE)
+    buf_mv = memoryview(buf)
     with open(zip_path, 'rb') as f:
         while True:
             # Read Local File Header Signature
@@ -33,13 +37,22 @@ def extract(zip_path, dest_dir):
                 except: pass
                 continue
                 
+            if method == 0:
+                # Store (No compression): copy in chunks, never the whole file
+                with open(out_path, 'wb') as out_f:
+                    remaining = comp_size
+                    while remaining > 0:
+                        n = f.readinto(buf_mv[:min(len(buf), remaining)])
+                        if not n:
+                            break
+                        out_f.write(buf_mv[:n])
+                        remaining -= n
+                continue
+
             # Read Data
             data = f.read(comp_size)
             
-            if method == 0:
-                # Store (No compression)
-                pass
-            elif method == 8:
+            if method == 8:
                 # Deflate
                 try:
                     import uzlib
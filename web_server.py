@@ -1,4 +1,4 @@
-from microdot import Microdot, send_file, Request
+from microdot import Microdot, send_file, Request, Response
 import ujson
 import os
 import wifi_manager
@@ -8,18 +8,50 @@ import auth_manager
 import ubinascii
 import logger
 import time
+import uasyncio
+import refresh_planner
+import frame_codec
+import playlist
+import display_ui
+import captive_portal
+import config
 
-# Increase Body Limit for OTA
-Request.max_content_length = 1024 * 1024
-Request.max_body_length = 1024 * 1024
+# Bodies above max_body_length are not read into RAM: handlers get them
+# from request.stream instead. Microdot checks max_content_length before
+# routing, so it is set for OTA packages and check_size limits the rest.
+MAX_CONTENT_LENGTH = 1024 * 1024
+Request.max_content_length = max(config.OTA_MAX_SIZE, MAX_CONTENT_LENGTH)
+Request.max_body_length = 16 * 1024
 
 app = Microdot()
 
+# Set whenever the message or image changes, so ui_task redraws right away
+# instead of waiting for the next minute. display_version lets it notice a
+# new upload even when custom_message itself stays "__IMAGE__".
+display_event = uasyncio.Event()
+display_version = 0
+
+def notify_display():
+    global display_version
+    display_version += 1
+    display_event.set()
+
 sessions = set()
 
 def get_token(request):
     return request.headers.get("X-Token")
 
+# Registered before check_auth, so connectivity probes skip it
+@app.before_request
+async def captive_probe(request):
+    if wifi_manager.is_ap_mode:
+        return captive_portal.respond(request.path)
+
+@app.before_request
+async def check_size(request):
+    if request.content_length > MAX_CONTENT_LENGTH and request.path != '/api/ota':
+        return 'Payload too large', 413
+
 @app.before_request
 async def check_auth(request):
     path = request.path
@@ -120,6 +152,7 @@ async def api_message(request):
                 return {'error': 'no json received'}, 400
                 
             custom_message = data.get("message", "")
+            notify_display()
             print(f"Set Message to: '{custom_message}'")
             return {'status': 'ok'}
         except Exception as e:
@@ -159,24 +192,169 @@ async def api_settings(request):
             "storage_total": s[0] * s[2]
         }
 
+IMAGE_FILE = 'image.bin'
+IMAGE_TMP = 'image.tmp'
+UPLOAD_CHUNK = 512
+
+async def save_stream(stream, f, size):
+    # Copy size bytes of the request body to f without holding it in RAM
+    remaining = size
+    while remaining > 0:
+        chunk = await stream.read(min(UPLOAD_CHUNK, remaining))
+        if not chunk:
+            raise ValueError('incomplete upload')
+        f.write(chunk)
+        remaining -= len(chunk)
+
+def remove_file(path):
+    # Drop a partial upload so it does not sit on flash
+    try: os.remove(path)
+    except OSError: pass
+
+async def receive_frame(request, path):
+    """
+    Store an uploaded frame (?format=raw, rle or deflate, see frame_codec)
+    at path and check that it decodes. Returns None on success, else the
+    error response (path is removed again).
+    """
+    fmt = frame_codec.FORMATS.get(request.args.get('format', 'raw'))
+    if fmt is None:
+        return {'error': 'unknown format'}, 400
+    size = request.content_length
+    if not size or size > frame_codec.MAX_PAYLOAD:
+        return {'error': f'Invalid size: {size}'}, 400
+
+    try:
+        # Stored as received; display_ui decodes it into the frame buffer
+        with open(path, 'wb') as f:
+            f.write(frame_codec.header(fmt))
+            await save_stream(request.stream, f, size)
+        with open(path, 'rb') as f:
+            frame_codec.decode(f)
+    except ValueError as e:
+        print(f"Frame Rejected: {e}")
+        remove_file(path)
+        return {'error': str(e)}, 400
+    except Exception as e:
+        print(f"Frame Upload Error: {e}")
+        remove_file(path)
+        return {'error': str(e)}, 500
+    return None
+
 @app.route('/api/display/image', methods=['POST'])
 async def api_display_image(request):
     global custom_message
+    error = await receive_frame(request, IMAGE_TMP)
+    if error:
+        return error
+
+    try: os.remove(IMAGE_FILE)
+    except OSError: pass
+    os.rename(IMAGE_TMP, IMAGE_FILE)
+
+    custom_message = "__IMAGE__"
+    notify_display()
+    print(f"Image Received and Saved ({request.content_length} bytes)")
+    return {'status': 'ok'}
+
+@app.route('/api/display/frame')
+async def api_display_frame(request):
+    # What the panel shows: ?format=png (default) or raw MONO_HLSB bytes
+    if not display_ui.have_last_frame:
+        return {'error': 'no frame yet'}, 404
+    fmt = request.args.get('format', 'png')
+    if fmt not in ('png', 'raw'):
+        return {'error': 'unknown format'}, 400
+
+    crc = display_ui.frame_crc
+    etag = '"%08x-%s"' % (crc, fmt)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304, headers
+
+    # Served straight from the display buffer, without a copy
+    if fmt == 'raw':
+        headers['Content-Type'] = 'application/octet-stream'
+        headers['Content-Length'] = str(len(display_ui.last_frame))
+        return memoryview(display_ui.last_frame), 200, headers
+    headers['Content-Type'] = 'image/png'
+    headers['Content-Length'] = str(frame_codec.png_size())
+    return same_frame(frame_codec.png_chunks(display_ui.last_frame), crc), 200, headers
+
+def same_frame(chunks, crc):
+    # The PNG is built from the live frame between yields. If ui_task sends
+    # a new frame meanwhile, stop instead of mixing two frames under the old
+    # ETag: Microdot takes this error as a lost client and closes the socket,
+    # so the client sees a short body.
+    for chunk in chunks:
+        if display_ui.frame_crc != crc:
+            raise OSError('Connection lost')
+        yield chunk
+
+# --- Playlist (SD card slideshow) ---
+
+@app.route('/api/playlist', methods=['GET', 'POST'])
+async def api_playlist(request):
+    global custom_message
+    if request.method == 'POST':
+        data = request.json
+        if data is None:
+            return {'error': 'no json'}, 400
+        if data.get("play"):
+            custom_message = playlist.MODE
+        elif custom_message == playlist.MODE:
+            custom_message = ""
+        notify_display()
+    return {
+        'available': playlist.available,
+        'playing': custom_message == playlist.MODE,
+        'current': playlist.current,
+        'slots': playlist.list_slots()
+    }
+
+@app.route('/api/playlist/<int:slot>', methods=['POST', 'DELETE'])
+async def api_playlist_slot(request, slot):
     try:
-        data = request.body
-        if len(data) != 4736:
-            return {'error': f'Invalid size: {len(data)}, expected 4736'}, 400
-            
-        with open('image.bin', 'wb') as f:
-            f.write(data)
-            
-        custom_message = "__IMAGE__"
-        print("Image Received and Saved")
-        return {'status': 'ok'}
-        
+        playlist.check_slot(slot)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if request.method == 'DELETE':
+        await playlist.remove(slot)
+        return {'status': 'removed'}
+
+    # Same body and ?format= as /api/display/image, plus ?duration=seconds
+    try:
+        duration = int(request.args.get('duration', playlist.DEFAULT_DURATION))
+    except ValueError:
+        return {'error': 'invalid duration'}, 400
+
+    tmp = playlist.slot_path(slot) + '.tmp'
+    error = await receive_frame(request, tmp)
+    if error:
+        return error
+    try:
+        await playlist.store(slot, tmp, duration)
     except Exception as e:
-        print(f"Image Upload Error: {e}")
+        print(f"Playlist Store Error: {e}")
+        remove_file(tmp)
         return {'error': str(e)}, 500
+    return {'status': 'ok', 'slot': slot}
+
+@app.route('/api/display/policy', methods=['GET', 'POST'])
+async def api_display_policy(request):
+    if request.method == 'POST':
+        try:
+            data = request.json
+            if data is None:
+                return {'error': 'no json'}, 400
+            refresh_planner.set_policy(data)
+        except Exception as e:
+            return {'error': str(e)}, 400
+    return {
+        'policy': refresh_planner.get_policy(),
+        'stats': refresh_planner.get_stats()
+    }
 
 @app.route('/api/wifi', methods=['POST'])
 async def api_wifi(request):
@@ -186,7 +364,6 @@ async def api_wifi(request):
         pw = data.get("password")
         if ssid:
             wifi_manager.save_config(ssid, pw)
-            import uasyncio
             async def reboot_later():
                 await uasyncio.sleep(1)
                 machine.reset()
@@ -200,17 +377,22 @@ async def api_wifi(request):
 @app.route('/api/ota', methods=['POST'])
 async def api_ota(request):
     import ota_manager
-    import ubinascii
     
     try:
         sig_hex = request.headers.get('X-Signature')
         if not sig_hex:
             return {'error': 'missing signature'}, 400
+        size = request.content_length
+        if not size:
+            return {'error': 'empty package'}, 400
+        s = os.statvfs('/')
+        if size > s[0] * s[3]:
+            return {'error': 'not enough free flash'}, 413
             
         signature = ubinascii.unhexlify(sig_hex)
-        zip_data = request.body
         
-        if ota_manager.verify_and_install(zip_data, signature):
+        # Streamed to flash in chunks and HMAC-ed on the way
+        if await ota_manager.receive_and_install(request.stream, size, signature):
             return {'status': 'updating'}
         else:
             return {'error': 'invalid signature'}, 403
@@ -219,6 +401,10 @@ async def api_ota(request):
         print(f"OTA Error: {e}")
         return {'error': str(e)}, 500
 
+@app.route('/api/portal/stats')
+async def api_portal_stats(request):
+    return captive_portal.get_stats()
+
 @app.route('/api/scan')
 async def api_scan(request):
     try:
@@ -228,39 +414,103 @@ async def api_scan(request):
         return {'error': str(e)}, 500
 
 # --- Static File Serving ---
+# www_manifest maps every file under www/ to its size, MIME type, content
+# hash and the size of its .gz variant. It comes from www/manifest.json
+# (written by tools/build_www.py), or from a scan of www/ at boot when that
+# is missing. Requests are routed by dict lookup, so unknown paths never
+# cost a failed open. Vite puts a content hash in every /assets/ file name,
+# so those can be cached forever.
+WWW_DIR = 'www'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+www_manifest = {}
+
+def mime_type(path):
+    ext = path.rsplit('.', 1)[-1]
+    return Response.types_map.get(ext, 'application/octet-stream')
+
+def scan_www(base, prefix=''):
+    # Fallback for builds without a manifest: sizes and types only
+    for entry in os.ilistdir(base):
+        name, kind = entry[0], entry[1]
+        rel = prefix + name
+        if kind == 0x4000: # Directory
+            scan_www(base + '/' + name, rel + '/')
+        elif not name.endswith('.gz') and name != 'manifest.json':
+            www_manifest[rel] = {
+                'size': os.stat(base + '/' + name)[6],
+                'type': mime_type(name),
+                'etag': None,
+                'gz': 0,
+            }
+
+def load_www_manifest():
+    global www_manifest
+    try:
+        with open(WWW_DIR + '/manifest.json') as f:
+            www_manifest = ujson.load(f)
+        return
+    except (OSError, ValueError) as e:
+        print(f"No www manifest ({e}), scanning {WWW_DIR}/")
+    www_manifest = {}
+    try:
+        scan_www(WWW_DIR)
+    except OSError:
+        pass
+    print(f"Static files: {len(www_manifest)}")
+
+def serve_static(request, path):
+    entry = www_manifest.get(path)
+    if entry is None:
+        if '.' in path.rsplit('/', 1)[-1] or path.startswith('assets/'):
+            return 'Not Found', 404
+        # SPA route (Vue Router): serve the app
+        path = 'index.html'
+        entry = www_manifest.get(path)
+        if entry is None:
+            return 'Not Found', 404
+
+    headers = {
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': IMMUTABLE if path.startswith('assets/') else 'no-cache',
+    }
+    gz = entry['gz'] and 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entry.get('etag')
+    if etag:
+        # Strong tags must differ between the gzip and identity bodies
+        etag = '"' + etag + ('-gz"' if gz else '"')
+        headers['ETag'] = etag
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304, headers
+
+    headers['Content-Length'] = str(entry['gz'] if gz else entry['size'])
+    response = send_file(WWW_DIR + '/' + path, content_type=entry['type'],
+                         compressed=gz, file_extension='.gz' if gz else '')
+    response.headers.update(headers)
+    return response
 
 @app.route('/')
 async def index(request):
-    return send_file('www/index.html')
+    return serve_static(request, 'index.html')
 
 @app.route('/setup')
 async def setup_page(request):
-    return send_file('www/index.html') 
+    return serve_static(request, 'index.html')
 
 @app.route('/assets/<path:path>')
 async def static_assets(request, path):
-    return send_file('www/assets/' + path)
+    return serve_static(request, 'assets/' + path)
 
 @app.route('/<path:path>')
 async def static_root(request, path):
-    # Fallback logic
-    if path in ["generate_204", "hotspot-detect.html", "canonical.html", "ncsi.txt"]:
-        # Captive Portal Probes
-        # Redirect to root
-        return '', 302, {'Location': '/'}
-        
-    try:
-        # Try to serve file
-        return send_file('www/' + path)
-    except:
-        # If 404, just serve index? Or let it 404?
-        # For SPA (Vue Router), we usually serve index.html.
-        # Let's serve index.html if file missing
-        return send_file('www/index.html')
+    # Captive portal probes are answered by captive_probe in AP mode.
+    # Files by manifest lookup; anything else without an extension is a
+    # client-side route and gets index.html
+    return serve_static(request, path)
 
 # Global State
 custom_message = ""
 
 async def start_server():
     print("Starting Microdot Server...")
+    load_www_manifest()
     await app.start_server(host='0.0.0.0', port=80, debug=True)